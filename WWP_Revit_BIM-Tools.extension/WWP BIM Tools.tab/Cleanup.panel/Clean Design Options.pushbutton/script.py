@@ -1,6 +1,8 @@
 #! python3
 from pyrevit import revit, DB, UI, script
-from System.Collections.Generic import List
+from System.Collections.Generic import HashSet
+
+from wwp_delete import batched_delete
 
 TITLE = "WWP BIM Tools"
 
@@ -9,21 +11,21 @@ if not doc:
     UI.TaskDialog.Show(TITLE, "No active document.")
     script.exit()
 
-option_ids = list(
+option_ids = (
     DB.FilteredElementCollector(doc)
     .OfClass(DB.DesignOption)
     .WhereElementIsNotElementType()
     .ToElementIds()
 )
 
-set_ids = list(
+set_ids = (
     DB.FilteredElementCollector(doc)
     .OfClass(DB.DesignOptionSet)
     .WhereElementIsNotElementType()
     .ToElementIds()
 )
 
-if not option_ids and not set_ids:
+if not option_ids.Count and not set_ids.Count:
     UI.TaskDialog.Show(TITLE, "No design options found.")
     script.exit()
 
@@ -32,7 +34,7 @@ msg = (
     "Design options: {1}\n\n"
     "All elements contained in these options will be deleted.\n"
     "Continue?"
-).format(len(set_ids), len(option_ids))
+).format(set_ids.Count, option_ids.Count)
 
 res = UI.TaskDialog.Show(
     TITLE,
@@ -43,9 +45,16 @@ res = UI.TaskDialog.Show(
 if res != UI.TaskDialogResult.Yes:
     script.exit()
 
-ids_to_delete = set(option_ids + set_ids)
+ids_to_delete = HashSet[DB.ElementId](option_ids)
+ids_to_delete.UnionWith(set_ids)
 
 with DB.Transaction(doc, "Clean Design Options") as t:
     t.Start()
-    doc.Delete(List[DB.ElementId](list(ids_to_delete)))
+    failed_count = batched_delete(doc, ids_to_delete)
     t.Commit()
+
+if failed_count:
+    UI.TaskDialog.Show(
+        TITLE,
+        "{0} element(s) could not be deleted.".format(failed_count),
+    )
@@ -1,6 +1,8 @@
 #! python3
 from pyrevit import revit, DB, UI, script
-from System.Collections.Generic import List
+from System.Collections.Generic import HashSet
+
+from wwp_delete import batched_delete
 
 TITLE = "WWP BIM Tools"
 
@@ -10,51 +12,34 @@ if not doc:
     script.exit()
 
 
-def is_detail_group(cat):
-    return cat and cat.Id.IntegerValue == int(DB.BuiltInCategory.OST_IOSDetailGroups)
-
+def collect_group_ids(cls, bic):
+    return (
+        DB.FilteredElementCollector(doc)
+        .OfClass(cls)
+        .OfCategory(bic)
+        .ToElementIds()
+    )
 
-def is_model_group(cat):
-    return cat and cat.Id.IntegerValue == int(DB.BuiltInCategory.OST_IOSModelGroups)
 
-
-detail_curve_ids = list(
+detail_curve_ids = (
     DB.FilteredElementCollector(doc)
     .OfClass(DB.DetailCurve)
     .WhereElementIsNotElementType()
     .ToElementIds()
 )
 
-group_instances = (
-    DB.FilteredElementCollector(doc)
-    .OfClass(DB.Group)
-    .WhereElementIsNotElementType()
-    .ToElements()
-)
+detail_group_instance_ids = collect_group_ids(DB.Group, DB.BuiltInCategory.OST_IOSDetailGroups)
+model_group_instance_ids = collect_group_ids(DB.Group, DB.BuiltInCategory.OST_IOSModelGroups)
+detail_group_type_ids = collect_group_ids(DB.GroupType, DB.BuiltInCategory.OST_IOSDetailGroups)
+model_group_type_ids = collect_group_ids(DB.GroupType, DB.BuiltInCategory.OST_IOSModelGroups)
 
-group_types = (
-    DB.FilteredElementCollector(doc)
-    .OfClass(DB.GroupType)
-    .WhereElementIsElementType()
-    .ToElements()
-)
-
-detail_group_instance_count = len([g for g in group_instances if is_detail_group(g.Category)])
-model_group_instance_count = len([g for g in group_instances if is_model_group(g.Category)])
-detail_group_type_count = len([g for g in group_types if is_detail_group(g.Category)])
-model_group_type_count = len([g for g in group_types if is_model_group(g.Category)])
-
-ids_to_delete = set(detail_curve_ids)
+ids_to_delete = HashSet[DB.ElementId](detail_curve_ids)
+ids_to_delete.UnionWith(detail_group_instance_ids)
+ids_to_delete.UnionWith(model_group_instance_ids)
+ids_to_delete.UnionWith(detail_group_type_ids)
+ids_to_delete.UnionWith(model_group_type_ids)
 
-for g in group_instances:
-    if is_detail_group(g.Category) or is_model_group(g.Category):
-        ids_to_delete.add(g.Id)
-
-for gt in group_types:
-    if is_detail_group(gt.Category) or is_model_group(gt.Category):
-        ids_to_delete.add(gt.Id)
-
-if not ids_to_delete:
+if not ids_to_delete.Count:
     UI.TaskDialog.Show(TITLE, "No detail lines or groups found.")
     script.exit()
 
@@ -67,11 +52,11 @@ msg = (
     "- Model group types: {4}\n\n"
     "Continue?"
 ).format(
-    len(detail_curve_ids),
-    detail_group_instance_count,
-    model_group_instance_count,
-    detail_group_type_count,
-    model_group_type_count,
+    detail_curve_ids.Count,
+    detail_group_instance_ids.Count,
+    model_group_instance_ids.Count,
+    detail_group_type_ids.Count,
+    model_group_type_ids.Count,
 )
 
 res = UI.TaskDialog.Show(
@@ -85,5 +70,11 @@ if res != UI.TaskDialogResult.Yes:
 
 with DB.Transaction(doc, "Delete Detail Lines and Groups") as t:
     t.Start()
-    doc.Delete(List[DB.ElementId](list(ids_to_delete)))
+    failed_count = batched_delete(doc, ids_to_delete)
     t.Commit()
+
+if failed_count:
+    UI.TaskDialog.Show(
+        TITLE,
+        "{0} element(s) could not be deleted.".format(failed_count),
+    )
@@ -1,112 +1,87 @@
 #! python3
 from pyrevit import revit, DB, UI, script
-from System.Collections.Generic import List
+from System.Collections.Generic import HashSet, List
 
 TITLE = "WWP BIM Tools"
 
+ANNOTATION_CATEGORY_TYPE = DB.CategoryType.Annotation
+SYMBOL_BICS = (
+    DB.BuiltInCategory.OST_DetailComponents,
+    DB.BuiltInCategory.OST_RepeatingDetail,
+)
+
 doc = revit.doc
 if not doc:
     UI.TaskDialog.Show(TITLE, "No active document.")
     script.exit()
 
 
-def is_ungrouped(elem):
-    return elem is not None and elem.GroupId == DB.ElementId.InvalidElementId
+def get_grouped_ids():
+    grouped_ids = List[DB.ElementId]()
+    for group in DB.FilteredElementCollector(doc).OfClass(DB.Group):
+        grouped_ids.AddRange(group.GetMemberIds())
+    return grouped_ids
 
 
-def is_symbol_like(elem):
-    cat = elem.Category if elem else None
-    if not cat:
-        return False
-    if cat.CategoryType == DB.CategoryType.Annotation:
-        return True
-    bic = cat.Id.IntegerValue
-    return bic in (
-        int(DB.BuiltInCategory.OST_DetailComponents),
-        int(DB.BuiltInCategory.OST_RepeatingDetail),
-    )
+def get_symbol_category_filter():
+    category_ids = List[DB.ElementId]()
+    for cat in doc.Settings.Categories:
+        if cat.CategoryType == ANNOTATION_CATEGORY_TYPE:
+            category_ids.Add(cat.Id)
+    for bic in SYMBOL_BICS:
+        category_ids.Add(DB.ElementId(bic))
+    return DB.ElementMulticategoryFilter(category_ids)
 
 
-def add_ungrouped_ids(elements, ids):
-    count = 0
-    for elem in elements:
-        if is_ungrouped(elem) and elem.Id not in ids:
-            ids.add(elem.Id)
-            count += 1
-    return count
+def class_filter(cls, bic=None):
+    elem_filter = DB.ElementClassFilter(cls)
+    if bic is None:
+        return elem_filter
+    return DB.LogicalAndFilter(elem_filter, DB.ElementCategoryFilter(bic))
 
 
-ids_to_delete = set()
+def ungrouped_collector(elem_filter):
+    # Group members are excluded natively instead of testing GroupId per element
+    collector = (
+        DB.FilteredElementCollector(doc)
+        .WherePasses(elem_filter)
+        .WhereElementIsNotElementType()
+    )
+    if grouped_ids.Count:
+        collector = collector.Excluding(grouped_ids)
+    return collector
 
-line_count = add_ungrouped_ids(
-    DB.FilteredElementCollector(doc)
-    .OfClass(DB.CurveElement)
-    .WhereElementIsNotElementType()
-    .ToElements(),
-    ids_to_delete,
-)
 
-filled_region_count = add_ungrouped_ids(
-    DB.FilteredElementCollector(doc)
-    .OfClass(DB.FilledRegion)
-    .WhereElementIsNotElementType()
-    .ToElements(),
-    ids_to_delete,
-)
+def add_ungrouped_ids(elem_ids, ids):
+    count_before = ids.Count
+    ids.UnionWith(elem_ids)
+    return ids.Count - count_before
 
-tag_count = add_ungrouped_ids(
-    DB.FilteredElementCollector(doc)
-    .OfClass(DB.IndependentTag)
-    .WhereElementIsNotElementType()
-    .ToElements(),
-    ids_to_delete,
-)
 
-area_count = add_ungrouped_ids(
-    DB.FilteredElementCollector(doc)
-    .OfClass(DB.Area)
-    .WhereElementIsNotElementType()
-    .ToElements(),
-    ids_to_delete,
-)
+grouped_ids = get_grouped_ids()
 
-room_count = add_ungrouped_ids(
-    DB.FilteredElementCollector(doc)
-    .OfClass(DB.Architecture.Room)
-    .WhereElementIsNotElementType()
-    .ToElements(),
-    ids_to_delete,
-)
-
-mask_count = add_ungrouped_ids(
-    DB.FilteredElementCollector(doc)
-    .OfClass(DB.MaskingRegion)
-    .WhereElementIsNotElementType()
-    .ToElements(),
-    ids_to_delete,
-)
+ids_to_delete = HashSet[DB.ElementId]()
 
-text_note_count = add_ungrouped_ids(
-    DB.FilteredElementCollector(doc)
-    .OfClass(DB.TextNote)
-    .WhereElementIsNotElementType()
-    .ToElements(),
-    ids_to_delete,
+# Rooms and areas are not native classes and can only be filtered
+# as spatial elements of their category. Rooms can be members of model
+# groups, so they go through the same group exclusion as everything else.
+ungrouped_filters = (
+    class_filter(DB.CurveElement),
+    class_filter(DB.FilledRegion),
+    class_filter(DB.IndependentTag),
+    class_filter(DB.SpatialElement, DB.BuiltInCategory.OST_Areas),
+    class_filter(DB.SpatialElement, DB.BuiltInCategory.OST_Rooms),
+    class_filter(DB.MaskingRegion),
+    class_filter(DB.TextNote),
+    DB.LogicalAndFilter(class_filter(DB.FamilyInstance), get_symbol_category_filter()),
 )
 
-symbols = (
-    DB.FilteredElementCollector(doc)
-    .OfClass(DB.FamilyInstance)
-    .WhereElementIsNotElementType()
-    .ToElements()
-)
+counts = [
+    add_ungrouped_ids(ungrouped_collector(f).ToElementIds(), ids_to_delete)
+    for f in ungrouped_filters
+]
 
-symbol_count = add_ungrouped_ids(
-    [e for e in symbols if is_symbol_like(e)],
-    ids_to_delete,
-)
-
-if not ids_to_delete:
+if not ids_to_delete.Count:
     UI.TaskDialog.Show(TITLE, "No ungrouped elements found for the selected categories.")
     script.exit()
 
@@ -121,16 +96,7 @@ msg = (
     "- Text notes: {6}\n"
     "- Symbols/detail items: {7}\n\n"
     "Continue?"
-).format(
-    line_count,
-    filled_region_count,
-    tag_count,
-    area_count,
-    room_count,
-    mask_count,
-    text_note_count,
-    symbol_count,
-)
+).format(*counts)
 
 res = UI.TaskDialog.Show(
     TITLE,
@@ -143,5 +109,5 @@ if res != UI.TaskDialogResult.Yes:
 
 with DB.Transaction(doc, "Delete Ungrouped Elements") as t:
     t.Start()
-    doc.Delete(List[DB.ElementId](list(ids_to_delete)))
+    doc.Delete(List[DB.ElementId](ids_to_delete))
     t.Commit()
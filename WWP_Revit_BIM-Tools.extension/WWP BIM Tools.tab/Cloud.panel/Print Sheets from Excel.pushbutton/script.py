@@ -22,17 +22,23 @@ to remain.
 """
 #pylint: disable=import-error,invalid-name,broad-except,superfluous-parens
 import re
+import string
+import bisect
+import contextlib
 import os.path as op
 import codecs
 import csv
 import unicodedata
-import os, datetime, locale
-from collections import namedtuple
+import zlib
+import os, datetime, locale, calendar
+from collections import namedtuple, OrderedDict
+from functools import partial
+from StringIO import StringIO
 
 from System import DateTime, Type, Activator, Array, Object, TimeSpan
 from System.Runtime.InteropServices import Marshal
 from System.Reflection import BindingFlags
-from System.Threading import Thread
+from System.IO import FileSystemWatcher, WatcherChangeTypes
 
 from pyrevit import HOST_APP
 from pyrevit import framework
@@ -59,7 +65,12 @@ config = script.get_config()
 
 # Non Printable Char
 NPC = u'\u200e'
-INDEX_FORMAT = '{{:0{digits}}}'
+INDEX_FORMAT = '%0{digits}d'
+
+
+def make_index_formatter(digits):
+    """Return a function formatting an index zero-padded to `digits`."""
+    return INDEX_FORMAT.format(digits=digits).__mod__
 
 
 def coerce_to_2d(values):
@@ -83,52 +94,298 @@ def coerce_to_2d(values):
             length = (ub0 - lb0) + 1
             if length < 1:
                 return None
+            # Array.Copy refuses rank changes; enumerate the source once
+            # instead of indexing it per element.
             arr = Array.CreateInstance(Object, 1, length)
-            for idx in range(lb0, ub0 + 1):
-                arr[0, idx - lb0] = values[idx]
+            for col, value in enumerate(values):
+                arr[0, col] = value
             return arr
     arr = Array.CreateInstance(Object, 1, 1)
     arr[0, 0] = values
     return arr
 
 
+BOM = u'\ufeff'
+NON_ASCII_FINDER = re.compile(u'[^\x00-\x7f]')
+unicode_normalize = unicodedata.normalize
+
+
+# normalized text per raw sheet/database string, cleared when full
+NORMALIZED_MATCH_TEXT = {}
+NORMALIZED_MATCH_TEXT_LIMIT = 4096
+
+
 def normalize_match_text(value):
     if value is None:
         return ''
-    try:
-        if isinstance(value, unicode):
-            text = value
-        elif isinstance(value, str):
+    if not isinstance(value, basestring):
+        return _normalize_match_text(value)
+    text = NORMALIZED_MATCH_TEXT.get(value)
+    if text is None:
+        if len(NORMALIZED_MATCH_TEXT) >= NORMALIZED_MATCH_TEXT_LIMIT:
+            NORMALIZED_MATCH_TEXT.clear()
+        text = NORMALIZED_MATCH_TEXT[value] = _normalize_match_text(value)
+    return text
+
+
+def _normalize_match_text(value):
+    if isinstance(value, unicode):
+        text = value
+    elif isinstance(value, str):
+        try:
+            text = value.decode('utf-8')
+        except Exception:
+            text = value.decode('cp1252', 'ignore')
+    else:
+        try:
+            text = unicode(value)
+        except Exception:
             try:
-                text = value.decode('utf-8')
+                text = str(value)
             except Exception:
-                text = value.decode('cp1252', 'ignore')
-        else:
-            text = unicode(value)
-    except Exception:
+                text = ''
+    text = text.strip().lstrip(BOM)
+    # NFC is a no-op for plain ASCII, which most sheet names/numbers are
+    if NON_ASCII_FINDER.search(text):
         try:
-            text = str(value)
+            text = unicode_normalize('NFC', text)
         except Exception:
-            text = ''
-    text = text.strip().lstrip(u'\ufeff')
-    try:
-        text = unicodedata.normalize('NFC', text)
-    except Exception:
-        pass
+            pass
     return text
 
 
+# d.m.yy, m/d/yy etc. with the same separator on both sides
+REVISION_DATE_FINDER = re.compile(r'(\d{1,2})([./])(\d{1,2})\2(\d{2})$')
+
+
+def make_sortable_date(date_text, dayfirst):
+    """Return revision date as YYYYMMDD, or '' if it can not be parsed."""
+    # sheets without a current revision have no date
+    if not date_text:
+        return ''
+    match = REVISION_DATE_FINDER.match(date_text)
+    if not match:
+        return ''
+    first, _, second, year = match.groups()
+    first, second, year = int(first), int(second), int(year)
+    # same pivot as strptime %y
+    year += 1900 if year >= 69 else 2000
+    # (day, month) candidates, preferred order first
+    candidates = ((first, second), (second, first))
+    if not dayfirst:
+        candidates = candidates[::-1]
+    for day, month in candidates:
+        if 1 <= month <= 12 \
+                and 1 <= day <= calendar.monthrange(year, month)[1]:
+            return '%04d%02d%02d' % (year, month, day)
+    return ''
+
+
+# custom param value getters for naming templates
+def get_tblock_param_value(sheet, type_values, param_name):
+    """Instance param value, falling back to the type param.
+
+    Type param values are shared by every sheet using that title block
+    type, so they are kept in `type_values` keyed by (type id, name).
+    """
+    param_value = revit.query.get_param_value(
+        revit.query.get_param(sheet.revit_tblock, param_name)
+        )
+    if param_value:
+        return param_value
+    tblock_type = sheet.revit_tblock_type
+    if not tblock_type:
+        return None
+    key = (get_elementid_value(tblock_type.Id), param_name)
+    if key not in type_values:
+        type_values[key] = revit.query.get_param_value(
+            revit.query.get_param(tblock_type, param_name)
+            )
+    return type_values[key]
+
+
+def get_sheet_param_value(sheet, param_name):
+    return revit.query.get_param_value(
+        revit.query.get_param(sheet.revit_sheet, param_name)
+        )
+
+
+def get_project_param_value(doc, param_name):
+    return revit.query.get_param_value(
+        doc.ProjectInformation.LookupParameter(param_name)
+        )
+
+
+def get_global_param_value(doc, param_name):
+    return revit.query.get_param_value(
+        revit.query.get_global_parameter(param_name, doc=doc)
+        )
+
+
+# fixed naming template fields that vary per sheet:
+# {name: resolver(sheet, excel_row)}; project-wide fields are
+# snapshotted per naming run in PrintSheetsWindow._get_run_field_values
+FILENAME_FIELD_RESOLVERS = {
+    'index': lambda sheet, row: sheet.print_index,
+    'number': lambda sheet, row: sheet.number,
+    'name': lambda sheet, row: sheet.name,
+    'name_dash': lambda sheet, row: sheet.name.replace(' ', '-'),
+    'name_underline': lambda sheet, row: sheet.name.replace(' ', '_'),
+    'issue_date': lambda sheet, row: sheet.issue_date,
+    'rev_number':
+        lambda sheet, row: sheet.revision.number if sheet.revision else '',
+    'rev_desc':
+        lambda sheet, row: sheet.revision.desc if sheet.revision else '',
+    'rev_date':
+        lambda sheet, row: sheet.revision.date if sheet.revision else '',
+    'excel_name': lambda sheet, row: row.DrawingName if row else '',
+    'excel_number': lambda sheet, row: row.DrawingNumber if row else '',
+}
+
+TEMPLATE_PARSER = string.Formatter()
+
+
+def get_template_fields(template):
+    """Return the top-level field names used in a format template."""
+    fields = set()
+    for _, field_name, _, _ in TEMPLATE_PARSER.parse(template):
+        if field_name:
+            fields.add(field_name.split('.', 1)[0].split('[', 1)[0])
+    return fields
+
+
 EXPORT_ENCODING = 'utf_16_le'
 if HOST_APP.is_newer_than(2020):
     EXPORT_ENCODING = 'utf_8'
 
 IS_REVIT_2022_OR_NEWER = HOST_APP.is_newer_than(2021)
 
+# collector class filters, resolved once
+VIEWSHEET_TYPE = framework.get_type(DB.ViewSheet)
+VIEWSHEETSET_TYPE = framework.get_type(DB.ViewSheetSet)
+VIEWSCHEDULE_TYPE = framework.get_type(DB.ViewSchedule)
+
+# lookup default that is never a stored value
+MISSING = object()
+# print rows per file actually read in this session: {path: (mtime, rows)}
+PRINT_ROWS_CACHE = {}
+# CRC32 of the CSV content last seen per path: {path: ((mtime, size), crc)}
+CSV_CONTENT_SIGNATURES = {}
+# normalized database paths per raw text box value
+NORMALIZED_EXCEL_PATHS = {}
+# custom param tokens of every value type e.g. {sheet_param:Name}
+CUSTOM_PARAM_FINDER = \
+    re.compile(r'{(tblock_param|sheet_param|proj_param|glob_param):(.*?)}')
+
 
 AvailableDoc = namedtuple('AvailableDoc', ['name', 'hash', 'linked'])
 
 NamingFormatter = namedtuple('NamingFormatter', ['template', 'desc'])
 
+# formatters that do not depend on the active document
+DEFAULT_FORMATTERS = (
+    NamingFormatter(
+        template='{index}',
+        desc='Print Index Number e.g. "0001"'
+    ),
+    NamingFormatter(
+        template='{number}',
+        desc='Sheet Number e.g. "A1.00"'
+    ),
+    NamingFormatter(
+        template='{name}',
+        desc='Sheet Name e.g. "1ST FLOOR PLAN"'
+    ),
+    NamingFormatter(
+        template='{name_dash}',
+        desc='Sheet Name (with - for space) e.g. "1ST-FLOOR-PLAN"'
+    ),
+    NamingFormatter(
+        template='{name_underline}',
+        desc='Sheet Name (with _ for space) e.g. "1ST_FLOOR_PLAN"'
+    ),
+    NamingFormatter(
+        template='{current_date}',
+        desc='Today''s Date e.g. "2019-10-12"'
+    ),
+    NamingFormatter(
+        template='{issue_date}',
+        desc='Sheet Issue Date e.g. "2019-10-12"'
+    ),
+    NamingFormatter(
+        template='{rev_number}',
+        desc='Revision Number e.g. "01"'
+    ),
+    NamingFormatter(
+        template='{rev_desc}',
+        desc='Revision Description e.g. "ASI01"'
+    ),
+    NamingFormatter(
+        template='{rev_date}',
+        desc='Revision Date e.g. "2019-10-12"'
+    ),
+    NamingFormatter(
+        template='{proj_name}',
+        desc='Project Name e.g. "MY_PROJECT"'
+    ),
+    NamingFormatter(
+        template='{proj_number}',
+        desc='Project Number e.g. "PR2019.12"'
+    ),
+    NamingFormatter(
+        template='{proj_building_name}',
+        desc='Project Building Name e.g. "BLDG01"'
+    ),
+    NamingFormatter(
+        template='{proj_issue_date}',
+        desc='Project Issue Date e.g. "2019-10-12"'
+    ),
+    NamingFormatter(
+        template='{proj_org_name}',
+        desc='Project Organization Name e.g. "MYCOMP"'
+    ),
+    NamingFormatter(
+        template='{proj_status}',
+        desc='Project Status e.g. "CD100"'
+    ),
+    NamingFormatter(
+        template='{username}',
+        desc='Active User e.g. "eirannejad"'
+    ),
+    NamingFormatter(
+        template='{revit_version}',
+        desc='Active Revit Version e.g. "2019"'
+    ),
+    NamingFormatter(
+        template='{excel_name}',
+        desc='Excel Drawing Name (Column B)'
+    ),
+    NamingFormatter(
+        template='{excel_number}',
+        desc='Excel Drawing Number (Column C)'
+    ),
+    NamingFormatter(
+        template='{sheet_param:PARAM_NAME}',
+        desc='Value of Given Sheet Parameter e.g. '
+             'Replace PARAM_NAME with target parameter name'
+    ),
+    NamingFormatter(
+        template='{tblock_param:PARAM_NAME}',
+        desc='Value of Given TitleBlock Parameter e.g. '
+             'Replace PARAM_NAME with target parameter name'
+    ),
+    NamingFormatter(
+        template='{proj_param:PARAM_NAME}',
+        desc='Value of Given Project Information Parameter e.g. '
+             'Replace PARAM_NAME with target parameter name'
+    ),
+    NamingFormatter(
+        template='{glob_param:PARAM_NAME}',
+        desc='Value of Given Global Parameter. '
+             'Replace PARAM_NAME with target parameter name'
+    ),
+)
+
 SheetRevision = namedtuple('SheetRevision', ['number', 'desc', 'date', 'is_set'])
 UNSET_REVISION = SheetRevision(number=None, desc=None, date=None, is_set=False)
 
@@ -154,8 +411,12 @@ class PrintUtils:
 
     @staticmethod
     def ensure_dir(dp):
-        if not os.path.exists(dp):
+        try:
             os.makedirs(dp)
+        except OSError:
+            # already exists, possibly created by another process meanwhile
+            if not os.path.isdir(dp):
+                raise
         return dp
 
     @staticmethod
@@ -205,10 +466,13 @@ class PrintUtils:
 
 class ComInterop(object):
     FLAGS = BindingFlags.Public | BindingFlags.Instance | BindingFlags.OptionalParamBinding
+    # shared by all argument-less property reads and calls
+    EMPTY_ARGS = Array.CreateInstance(Object, 0)
 
     @staticmethod
     def _to_object_array(values):
-        values = values or ()
+        if not values:
+            return ComInterop.EMPTY_ARGS
         arr = Array.CreateInstance(Object, len(values))
         for idx, value in enumerate(values):
             arr[idx] = value
@@ -259,6 +523,39 @@ class ComInterop(object):
             pass
 
 
+class ExcelAppState(object):
+    """Suspend Excel repaint, events, recalculation and user input."""
+    XL_CALCULATION_MANUAL = -4135
+    SUSPENDED_STATE = (
+        ("ScreenUpdating", False),
+        ("EnableEvents", False),
+        ("Interactive", False),
+        ("Calculation", XL_CALCULATION_MANUAL),
+    )
+
+    def __init__(self, excel):
+        self._excel = excel
+        self._saved_state = []
+
+    def __enter__(self):
+        for prop, value in ExcelAppState.SUSPENDED_STATE:
+            try:
+                self._saved_state.append((prop, ComInterop.get(self._excel, prop)))
+                ComInterop.set(self._excel, prop, value)
+            except Exception:
+                pass
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        for prop, value in reversed(self._saved_state):
+            try:
+                ComInterop.set(self._excel, prop, value)
+            except Exception:
+                pass
+        self._saved_state = []
+        return False
+
+
 class ExcelPrintRow(object):
     def __init__(self, file_name="", drawing_name="", drawing_number=""):
         self.PrintFileName = file_name
@@ -270,17 +567,39 @@ class ExcelDatabase(object):
     HEADER_FILE_NAME = "Printed File Name"
     HEADER_DRAWING_NAME = "Drawing Name"
     HEADER_DRAWING_NUMBER = "Drawing Number"
+    # rows per Value2 read; keeps one band of VARIANTs alive at a time
+    READ_BAND_ROWS = 5000
+
+    # total time to wait for a new workbook to show up on disk
+    SAVE_WAIT_MS = 1500
 
     @staticmethod
-    def _path_exists_with_retry(path, retries=8, sleep_ms=150):
-        candidate = (path or '').strip()
-        if not candidate:
+    def _watch_file(path):
+        """Start watching for path to be created; None if not possible."""
+        parent_dir = op.dirname(path)
+        if not parent_dir or not op.isdir(parent_dir):
+            return None
+        # Excel may write to a temp file and rename it into place
+        watcher = FileSystemWatcher(parent_dir, op.basename(path))
+        try:
+            watcher.EnableRaisingEvents = True
+        except Exception:
+            watcher.Dispose()
+            return None
+        return watcher
+
+    @staticmethod
+    def _wait_for_file(path, watcher, deadline):
+        if op.exists(path):
+            return True
+        if watcher is None:
             return False
-        for _ in range(retries):
-            if op.exists(candidate):
-                return True
-            Thread.Sleep(sleep_ms)
-        return op.exists(candidate)
+        remaining_ms = int((deadline - DateTime.Now).TotalMilliseconds)
+        if remaining_ms > 0:
+            watcher.WaitForChanged(
+                WatcherChangeTypes.Created | WatcherChangeTypes.Renamed,
+                remaining_ms)
+        return op.exists(path)
 
     @staticmethod
     def _is_csv_path(path):
@@ -314,6 +633,9 @@ class ExcelDatabase(object):
 
     @staticmethod
     def _csv_cell(value):
+        # plain ASCII text is written as-is, skipping conversion and encoding
+        if isinstance(value, unicode) and not NON_ASCII_FINDER.search(value):
+            return value
         text = ExcelDatabase._to_text(value)
         try:
             return text.encode('utf-8')
@@ -326,48 +648,61 @@ class ExcelDatabase(object):
         if not op.exists(path):
             return result
 
-        with open(path, 'rb') as csv_file:
-            reader = csv.reader(csv_file)
-            rows = list(reader)
-
-        if not rows:
-            return result
-
-        headers = {}
-        header_row = rows[0] or []
-        for idx, val in enumerate(header_row):
-            key = ExcelDatabase._to_text(val).strip().lstrip(u'\ufeff')
-            if key and key not in headers:
-                headers[key] = idx
+        to_text = ExcelDatabase._to_text
 
-        col_file_name = headers.get(ExcelDatabase.HEADER_FILE_NAME, 0)
-        col_drawing_name = headers.get(ExcelDatabase.HEADER_DRAWING_NAME, 1)
-        col_drawing_number = headers.get(ExcelDatabase.HEADER_DRAWING_NUMBER, 2)
+        def cell_text(row, col_idx):
+            if col_idx < 0 or col_idx >= len(row):
+                return ''
+            return to_text(row[col_idx]).strip()
 
-        for row in rows[1:]:
-            if not row:
-                continue
-
-            def safe_get(col_idx):
-                if col_idx < 0 or col_idx >= len(row):
-                    return ''
-                return ExcelDatabase._to_text(row[col_idx]).strip()
-
-            drawing_name = normalize_match_text(safe_get(col_drawing_name))
-            if not drawing_name:
-                continue
+        with open(path, 'rb') as csv_file:
+            rows_iter = iter(csv.reader(csv_file))
+            header_row = next(rows_iter, None)
+            if header_row is None:
+                return result
 
-            file_name = safe_get(col_file_name)
-            drawing_number = normalize_match_text(safe_get(col_drawing_number))
-            result.append(ExcelPrintRow(file_name, drawing_name, drawing_number))
+            headers = {}
+            for idx, val in enumerate(header_row):
+                key = to_text(val).strip().lstrip(BOM)
+                if key and key not in headers:
+                    headers[key] = idx
+
+            col_file_name = headers.get(ExcelDatabase.HEADER_FILE_NAME, 0)
+            col_drawing_name = headers.get(ExcelDatabase.HEADER_DRAWING_NAME, 1)
+            col_drawing_number = headers.get(ExcelDatabase.HEADER_DRAWING_NUMBER, 2)
+
+            add_row = result.append
+            for row in rows_iter:
+                if not row:
+                    continue
+                drawing_name = normalize_match_text(cell_text(row, col_drawing_name))
+                if not drawing_name:
+                    continue
+                add_row(ExcelPrintRow(
+                    cell_text(row, col_file_name),
+                    drawing_name,
+                    normalize_match_text(cell_text(row, col_drawing_number))))
 
         return result
 
+    @staticmethod
+    def _get_mapped_name(name_map, number_map, drawing_name, drawing_number):
+        # a name key takes precedence even if its value is empty;
+        # one probe per map
+        mapped_name = name_map.get(drawing_name, MISSING) if name_map else MISSING
+        if mapped_name is not MISSING:
+            return mapped_name
+        if number_map:
+            return number_map.get(drawing_number)
+        return None
+
     @staticmethod
     def _generate_or_update_csv(path, sheets, name_map=None, number_map=None, force_update=False):
         existing_rows = ExcelDatabase._read_print_rows_csv(path) if op.exists(path) else []
         row_by_name = {}
         ordered_rows = []
+        # new rows per drawing name, in the order sheets were last written
+        new_rows_by_name = OrderedDict()
 
         for row in existing_rows:
             key = (row.DrawingName or '').strip()
@@ -382,11 +717,8 @@ class ExcelDatabase(object):
                 continue
             default_file_name = "{0}_{1}".format(drawing_number, drawing_name)
 
-            mapped_name = None
-            if name_map and drawing_name in name_map:
-                mapped_name = name_map.get(drawing_name)
-            elif number_map and drawing_number in number_map:
-                mapped_name = number_map.get(drawing_number)
+            mapped_name = ExcelDatabase._get_mapped_name(
+                name_map, number_map, drawing_name, drawing_number)
 
             if isinstance(mapped_name, (list, tuple)):
                 mapped_values = [normalize_match_text(x) for x in mapped_name if normalize_match_text(x)]
@@ -399,31 +731,96 @@ class ExcelDatabase(object):
 
             # Replace any existing rows for the same drawing name so that
             # CSV can carry one or multiple file-name variants per sheet.
-            ordered_rows = [r for r in ordered_rows if normalize_match_text(r.DrawingName) != drawing_name]
-
-            for mapped_value in mapped_values:
-                ordered_rows.append(ExcelPrintRow(mapped_value, drawing_name, drawing_number))
-            row_by_name[drawing_name] = ordered_rows[-1]
-
-        with open(path, 'wb') as csv_file:
-            csv_file.write(codecs.BOM_UTF8)
-            writer = csv.writer(csv_file)
-            writer.writerow([
-                ExcelDatabase._csv_cell(ExcelDatabase.HEADER_FILE_NAME),
-                ExcelDatabase._csv_cell(ExcelDatabase.HEADER_DRAWING_NAME),
-                ExcelDatabase._csv_cell(ExcelDatabase.HEADER_DRAWING_NUMBER),
-            ])
-            for row in ordered_rows:
-                writer.writerow([
-                    ExcelDatabase._csv_cell(row.PrintFileName),
-                    ExcelDatabase._csv_cell(row.DrawingName),
-                    ExcelDatabase._csv_cell(row.DrawingNumber),
-                ])
+            new_rows_by_name.pop(drawing_name, None)
+            new_rows_by_name[drawing_name] = [
+                ExcelPrintRow(mapped_value, drawing_name, drawing_number)
+                for mapped_value in mapped_values
+                ]
+            row_by_name[drawing_name] = new_rows_by_name[drawing_name][-1]
+
+        # drop replaced rows in one pass, then append the new ones
+        if new_rows_by_name:
+            ordered_rows = [
+                r for r in ordered_rows
+                if normalize_match_text(r.DrawingName) not in new_rows_by_name
+                ]
+            for new_rows in new_rows_by_name.values():
+                ordered_rows.extend(new_rows)
+
+        csv_cell = ExcelDatabase._csv_cell
+        rows_out = [[
+            csv_cell(ExcelDatabase.HEADER_FILE_NAME),
+            csv_cell(ExcelDatabase.HEADER_DRAWING_NAME),
+            csv_cell(ExcelDatabase.HEADER_DRAWING_NUMBER),
+        ]]
+        rows_out.extend(
+            [csv_cell(row.PrintFileName),
+             csv_cell(row.DrawingName),
+             csv_cell(row.DrawingNumber)]
+            for row in ordered_rows
+        )
+
+        out = StringIO()
+        csv.writer(out).writerows(rows_out)
+        content = out.getvalue()
+
+        content_crc = zlib.crc32(content) & 0xffffffff
+        file_signature = ExcelDatabase._get_file_signature(path)
+        known = CSV_CONTENT_SIGNATURES.get(path)
+        append_from = None
+        if known and file_signature and known[0] == file_signature:
+            # file untouched since it was last seen; compare checksums
+            # instead of reading it back
+            if known[1] == content_crc:
+                return op.abspath(path)
+            existing_len = file_signature[1] - len(codecs.BOM_UTF8)
+            if 0 < existing_len < len(content) \
+                    and zlib.crc32(content[:existing_len]) & 0xffffffff == known[1]:
+                append_from = existing_len
+        else:
+            existing_content = ExcelDatabase._read_csv_content(path)
+            if content == existing_content:
+                CSV_CONTENT_SIGNATURES[path] = (file_signature, content_crc)
+                return op.abspath(path)
+            if existing_content and content.startswith(existing_content):
+                append_from = len(existing_content)
+
+        if append_from is not None:
+            # only rows were appended; keep the existing lines untouched
+            with open(path, 'ab') as csv_file:
+                csv_file.write(content[append_from:])
+        else:
+            with open(path, 'wb') as csv_file:
+                csv_file.write(codecs.BOM_UTF8)
+                csv_file.write(content)
 
+        CSV_CONTENT_SIGNATURES[path] = \
+            (ExcelDatabase._get_file_signature(path), content_crc)
         return op.abspath(path)
 
+    @staticmethod
+    def _get_file_signature(path):
+        try:
+            return op.getmtime(path), op.getsize(path)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _read_csv_content(path):
+        if not op.exists(path):
+            return None
+        with open(path, 'rb') as csv_file:
+            content = csv_file.read()
+        if content.startswith(codecs.BOM_UTF8):
+            return content[len(codecs.BOM_UTF8):]
+        # files without a BOM are rewritten so that one gets added
+        return None
+
     @staticmethod
     def generate_or_update(path, sheets, name_map=None, number_map=None, force_update=False):
+        # an .xlsx may have been served from its CSV sibling
+        PRINT_ROWS_CACHE.pop(path, None)
+        PRINT_ROWS_CACHE.pop(op.splitext(path)[0] + '.csv', None)
         if ExcelDatabase._is_csv_path(path):
             return ExcelDatabase._generate_or_update_csv(
                 path, sheets, name_map=name_map, number_map=number_map, force_update=force_update)
@@ -434,7 +831,6 @@ class ExcelDatabase(object):
         worksheets = None
         sheet = None
         used_range = None
-        cells = None
         saved_path = path
 
         try:
@@ -455,85 +851,102 @@ class ExcelDatabase(object):
             worksheets = ComInterop.get(workbook, "Worksheets")
             sheet = ComInterop.get(worksheets, "Item", 1)
             used_range = ComInterop.get(sheet, "UsedRange")
-            cells = ComInterop.get(sheet, "Cells")
 
-            col_file_name = 1
             col_drawing_name = 2
-            col_drawing_number = 3
-            ExcelDatabase.ensure_headers(cells, col_file_name, col_drawing_name, col_drawing_number)
-
-            values = coerce_to_2d(ComInterop.get(used_range, "Value2"))
-            row_by_drawing_name = ExcelDatabase.read_existing_rows(values, col_drawing_name) if values else {}
-
-            row_start = values.GetLowerBound(0) if values else 1
-            row_end = values.GetUpperBound(0) if values else 1
-            last_row = (row_end - row_start) + 2
-            if last_row < 2:
-                last_row = 2
+            headers = [ExcelDatabase.HEADER_FILE_NAME,
+                       ExcelDatabase.HEADER_DRAWING_NAME,
+                       ExcelDatabase.HEADER_DRAWING_NUMBER]
+            # rows are edited in memory; only changed and appended rows
+            # are written back, so untouched cells keep their formulas
+            header_row = None
+            rows = []
+            for band_start, values in ExcelDatabase.iter_value_bands(used_range):
+                band = ExcelDatabase.read_value_rows(values, 3, skip_header=False)
+                if band_start == 0 and band:
+                    header_row = band.pop(0)
+                rows.extend(band)
+            row_by_drawing_name = ExcelDatabase.read_existing_rows(rows, col_drawing_name)
+            changed_rows = set()
 
             for view_sheet in sheets:
                 drawing_name = view_sheet.Name
                 drawing_number = view_sheet.SheetNumber
                 default_file_name = "{0}_{1}".format(drawing_number, drawing_name)
 
-                mapped_name = None
-                if name_map and drawing_name in name_map:
-                    mapped_name = name_map.get(drawing_name)
-                elif number_map and drawing_number in number_map:
-                    mapped_name = number_map.get(drawing_number)
+                mapped_name = ExcelDatabase._get_mapped_name(
+                    name_map, number_map, drawing_name, drawing_number)
 
                 if drawing_name in row_by_drawing_name:
-                    row_index = row_by_drawing_name[drawing_name]
-                    current_file_name = ExcelDatabase.get_cell_value(cells, row_index, col_file_name)
+                    row_idx = row_by_drawing_name[drawing_name] - 2
+                    row = rows[row_idx]
+                    new_row = list(row)
+                    current_file_name = row[0]
                     if mapped_name:
-                        ExcelDatabase.set_cell_value(cells, row_index, col_file_name, mapped_name)
+                        new_row[0] = mapped_name
                     elif force_update and default_file_name:
-                        ExcelDatabase.set_cell_value(cells, row_index, col_file_name, default_file_name)
+                        new_row[0] = default_file_name
                     elif not current_file_name or not str(current_file_name).strip():
-                        ExcelDatabase.set_cell_value(cells, row_index, col_file_name, default_file_name)
+                        new_row[0] = default_file_name
 
-                    ExcelDatabase.set_cell_value(cells, row_index, col_drawing_name, drawing_name)
-                    ExcelDatabase.set_cell_value(cells, row_index, col_drawing_number, drawing_number)
+                    new_row[1] = drawing_name
+                    new_row[2] = drawing_number
+                    if new_row != row:
+                        rows[row_idx] = new_row
+                        changed_rows.add(row_idx)
                 else:
-                    ExcelDatabase.set_cell_value(cells, last_row, col_file_name, mapped_name or default_file_name)
-                    ExcelDatabase.set_cell_value(cells, last_row, col_drawing_name, drawing_name)
-                    ExcelDatabase.set_cell_value(cells, last_row, col_drawing_number, drawing_number)
-                    row_by_drawing_name[drawing_name] = last_row
-                    last_row += 1
+                    rows.append([mapped_name or default_file_name, drawing_name, drawing_number])
+                    changed_rows.add(len(rows) - 1)
+                    row_by_drawing_name[drawing_name] = len(rows) + 1
+
+            # restored before saving; the workbook stores its calculation mode
+            with ExcelAppState(excel):
+                if list(header_row or []) != headers:
+                    ExcelDatabase.write_rows(sheet, 1, [headers])
+                # one Value2 block per run of consecutive changed rows
+                run = []
+                for row_idx in sorted(changed_rows):
+                    if run and row_idx != run[-1] + 1:
+                        ExcelDatabase.write_rows(
+                            sheet, run[0] + 2, [rows[x] for x in run])
+                        run = []
+                    run.append(row_idx)
+                if run:
+                    ExcelDatabase.write_rows(
+                        sheet, run[0] + 2, [rows[x] for x in run])
 
             if op.exists(path):
                 ComInterop.call(workbook, "Save")
             else:
-                saved = False
-                try:
-                    ComInterop.call(workbook, "SaveAs", path)
-                    saved = ExcelDatabase._path_exists_with_retry(path)
-                except Exception:
-                    saved = False
-
                 # Excel can silently ignore SaveAs in some COM contexts unless
                 # explicit file format is provided or copy-save is used.
-                if not saved:
-                    try:
-                        ComInterop.call(workbook, "SaveAs", path, 51)  # xlOpenXMLWorkbook
-                        saved = ExcelDatabase._path_exists_with_retry(path)
-                    except Exception:
-                        saved = False
-
-                if not saved:
-                    try:
-                        ComInterop.call(workbook, "SaveCopyAs", path)
-                        saved = ExcelDatabase._path_exists_with_retry(path)
-                    except Exception:
-                        saved = False
-
-            if not ExcelDatabase._path_exists_with_retry(path):
+                save_attempts = (
+                    ("SaveAs", path),
+                    ("SaveAs", path, 51),  # xlOpenXMLWorkbook
+                    ("SaveCopyAs", path),
+                    )
+                # armed before saving so a fast write is not missed;
+                # all attempts share one short wait
+                watcher = ExcelDatabase._watch_file(path)
+                deadline = DateTime.Now.AddMilliseconds(ExcelDatabase.SAVE_WAIT_MS)
+                try:
+                    for save_attempt in save_attempts:
+                        try:
+                            ComInterop.call(workbook, *save_attempt)
+                        except Exception:
+                            continue
+                        if ExcelDatabase._wait_for_file(path, watcher, deadline):
+                            break
+                finally:
+                    if watcher is not None:
+                        watcher.Dispose()
+
+            if not op.exists(path):
                 workbook_fullname = ComInterop.get(workbook, "FullName")
                 if workbook_fullname:
                     workbook_fullname = op.abspath(str(workbook_fullname))
-                    if ExcelDatabase._path_exists_with_retry(workbook_fullname):
+                    if op.exists(workbook_fullname):
                         saved_path = workbook_fullname
-            if not ExcelDatabase._path_exists_with_retry(saved_path):
+            if not op.exists(saved_path):
                 raise Exception("Excel save completed but no file was created on disk.")
             return saved_path
         finally:
@@ -542,7 +955,6 @@ class ExcelDatabase(object):
             if excel is not None:
                 ComInterop.call(excel, "Quit")
 
-            ComInterop.release(cells)
             ComInterop.release(used_range)
             ComInterop.release(sheet)
             ComInterop.release(worksheets)
@@ -550,12 +962,46 @@ class ExcelDatabase(object):
             ComInterop.release(workbooks)
             ComInterop.release(excel)
 
+    @staticmethod
+    def _get_mtime(path):
+        try:
+            return op.getmtime(path)
+        except Exception:
+            return None
+
     @staticmethod
     def read_print_rows(path):
+        return list(ExcelDatabase.iter_print_rows(path))
+
+    @staticmethod
+    def iter_print_rows(path):
+        """Iterate over print rows, reusing the last read while the file is unchanged."""
+        source_path = ExcelDatabase._get_print_rows_source(path)
+        mtime = ExcelDatabase._get_mtime(source_path)
+        cached = PRINT_ROWS_CACHE.get(source_path)
+        if cached and mtime is not None and cached[0] == mtime:
+            return iter(cached[1])
+
+        rows = ExcelDatabase._read_print_rows_uncached(source_path)
+        if mtime is not None:
+            PRINT_ROWS_CACHE[source_path] = (mtime, rows)
+        return iter(rows)
+
+    @staticmethod
+    def _get_print_rows_source(path):
         if ExcelDatabase._is_csv_path(path):
-            return ExcelDatabase._read_print_rows_csv(path)
+            return path
+        # prefer an up-to-date CSV sibling over starting Excel
+        csv_path = op.splitext(path)[0] + '.csv'
+        csv_mtime = ExcelDatabase._get_mtime(csv_path)
+        if csv_mtime is not None and csv_mtime >= ExcelDatabase._get_mtime(path):
+            return csv_path
+        return path
 
-        result = []
+    @staticmethod
+    def _read_print_rows_uncached(path):
+        if ExcelDatabase._is_csv_path(path):
+            return ExcelDatabase._read_print_rows_csv(path)
 
         excel = None
         workbooks = None
@@ -597,117 +1043,143 @@ class ExcelDatabase(object):
         if used_range is None:
             return result
 
-        cells = None
-        rows_obj = None
-        cols_obj = None
-        try:
-            cells = ComInterop.get(used_range, "Cells")
-            rows_obj = ComInterop.get(used_range, "Rows")
-            cols_obj = ComInterop.get(used_range, "Columns")
-
-            row_count = int(ComInterop.get(rows_obj, "Count") or 0)
-            col_count = int(ComInterop.get(cols_obj, "Count") or 0)
-            if row_count < 1 or col_count < 1:
-                return result
-
-            headers = {}
-            for col in range(1, col_count + 1):
-                header_val = ExcelDatabase.get_cell_value(cells, 1, col)
-                if header_val is None:
-                    continue
-                header = str(header_val).strip()
-                if not header:
-                    continue
-                if header not in headers:
-                    headers[header] = col
-
-            col_file_name = headers.get(ExcelDatabase.HEADER_FILE_NAME, 1)
-            col_drawing_name = headers.get(ExcelDatabase.HEADER_DRAWING_NAME, 2)
-            col_drawing_number = headers.get(ExcelDatabase.HEADER_DRAWING_NUMBER, 3)
-
-            if col_drawing_name < 1 or col_drawing_name > col_count:
-                return result
-
-            for row in range(2, row_count + 1):
-                drawing_name_val = ExcelDatabase.get_cell_value(cells, row, col_drawing_name)
-                if drawing_name_val is None:
-                    continue
+        # the first band holds the header row
+        columns = None
+        for band_start, values in ExcelDatabase.iter_value_bands(used_range):
+            row_start = values.GetLowerBound(0)
+            row_end = values.GetUpperBound(0)
+            col_start = values.GetLowerBound(1)
+            col_count = (values.GetUpperBound(1) - col_start) + 1
+            if row_end < row_start or col_count < 1:
+                continue
 
-                drawing_name = str(drawing_name_val).strip()
-                if not drawing_name:
-                    continue
+            def cell_text(row, col):
+                if col < 1 or col > col_count:
+                    return ""
+                value = values[row, col_start + col - 1]
+                if value is None:
+                    return ""
+                return str(value).strip()
+
+            if columns is None:
+                headers = {}
+                for col in range(1, col_count + 1):
+                    header = cell_text(row_start, col)
+                    if header and header not in headers:
+                        headers[header] = col
+
+                columns = (headers.get(ExcelDatabase.HEADER_FILE_NAME, 1),
+                           headers.get(ExcelDatabase.HEADER_DRAWING_NAME, 2),
+                           headers.get(ExcelDatabase.HEADER_DRAWING_NUMBER, 3))
+                if columns[1] < 1 or columns[1] > col_count:
+                    return result
+                row_start += 1
+
+            col_file_name, col_drawing_name, col_drawing_number = columns
+            drawing_names = ((row, cell_text(row, col_drawing_name))
+                             for row in range(row_start, row_end + 1))
+            result.extend([ExcelPrintRow(cell_text(row, col_file_name),
+                                         drawing_name,
+                                         cell_text(row, col_drawing_number))
+                           for row, drawing_name in drawing_names
+                           if drawing_name])
+        return result
 
-                file_name = ""
-                if col_file_name >= 1 and col_file_name <= col_count:
-                    file_name_val = ExcelDatabase.get_cell_value(cells, row, col_file_name)
-                    if file_name_val is not None:
-                        file_name = str(file_name_val).strip()
+    @staticmethod
+    def iter_value_bands(used_range, band_rows=READ_BAND_ROWS):
+        """Yield (first row offset, Value2 array) per band of used range rows."""
+        rows = None
+        columns = None
+        try:
+            rows = ComInterop.get(used_range, "Rows")
+            columns = ComInterop.get(used_range, "Columns")
+            row_count = ComInterop.get(rows, "Count")
+            col_count = ComInterop.get(columns, "Count")
+        finally:
+            ComInterop.release(rows)
+            ComInterop.release(columns)
 
-                drawing_number = ""
-                if col_drawing_number >= 1 and col_drawing_number <= col_count:
-                    drawing_number_val = ExcelDatabase.get_cell_value(cells, row, col_drawing_number)
-                    if drawing_number_val is not None:
-                        drawing_number = str(drawing_number_val).strip()
+        for band_start in range(0, row_count, band_rows):
+            offset = None
+            band = None
+            try:
+                offset = ComInterop.get(used_range, "Offset", band_start, 0)
+                band = ComInterop.get(offset, "Resize",
+                                      min(band_rows, row_count - band_start),
+                                      col_count)
+                values = coerce_to_2d(ComInterop.get(band, "Value2"))
+            finally:
+                ComInterop.release(band)
+                ComInterop.release(offset)
+            if values is not None:
+                yield band_start, values
 
-                result.append(ExcelPrintRow(file_name, drawing_name, drawing_number))
-            return result
-        finally:
-            ComInterop.release(cols_obj)
-            ComInterop.release(rows_obj)
-            ComInterop.release(cells)
+    @staticmethod
+    def read_existing_rows(rows, col_drawing_name):
+        existing = {}
+        col_index = col_drawing_name - 1
+        if col_index < 0:
+            return existing
+
+        for row_idx, row in enumerate(rows):
+            if col_index >= len(row):
+                continue
+            name_val = row[col_index]
+            if name_val is None:
+                continue
+            name = intern(str(name_val).strip())
+            if not name:
+                continue
+            if name not in existing:
+                # sheet row number, below the header row
+                existing[name] = row_idx + 2
+        return existing
 
     @staticmethod
-    def read_existing_rows(values, col_drawing_name):
-        rows = {}
+    def read_value_rows(values, col_count, skip_header=True):
+        rows = []
         if values is None:
             return rows
         row_start = values.GetLowerBound(0)
+        if not skip_header:
+            row_start -= 1
         row_end = values.GetUpperBound(0)
         col_start = values.GetLowerBound(1)
         col_end = values.GetUpperBound(1)
-        col_index = col_drawing_name - 1 + col_start
-        if col_index < col_start or col_index > col_end:
-            return rows
-
+        col_indices = range(col_start, col_start + col_count)
         for row in range(row_start + 1, row_end + 1):
-            name_val = values[row, col_index]
-            if name_val is None:
-                continue
-            name = str(name_val).strip()
-            if not name:
-                continue
-            if name not in rows:
-                rows[name] = (row - row_start) + 1
+            rows.append([values[row, col] if col <= col_end else None
+                         for col in col_indices])
         return rows
 
     @staticmethod
-    def ensure_headers(cells, col_file_name, col_drawing_name, col_drawing_number):
-        ExcelDatabase.set_cell_value(cells, 1, col_file_name, ExcelDatabase.HEADER_FILE_NAME)
-        ExcelDatabase.set_cell_value(cells, 1, col_drawing_name, ExcelDatabase.HEADER_DRAWING_NAME)
-        ExcelDatabase.set_cell_value(cells, 1, col_drawing_number, ExcelDatabase.HEADER_DRAWING_NUMBER)
-
-    @staticmethod
-    def get_cell_value(cells, row, col):
-        cell = None
-        try:
-            cell = ComInterop.get(cells, "Item", row, col)
-            return ComInterop.get(cell, "Value2")
-        except Exception:
-            return None
-        finally:
-            ComInterop.release(cell)
-
-    @staticmethod
-    def set_cell_value(cells, row, col, value):
-        cell = None
-        try:
-            cell = ComInterop.get(cells, "Item", row, col)
-            ComInterop.set(cell, "Value2", value)
+    def write_rows(sheet, first_row, rows):
+        """Write rows as one Value2 block starting at column A of first_row."""
+        col_count = len(rows[0])
+        values = Array.CreateInstance(Object, len(rows), col_count)
+        for row_idx, row in enumerate(rows):
+            for col in range(col_count):
+                values[row_idx, col] = row[col]
+
+        target = None
+        try:
+            last_cell = "{0}{1}".format(chr(ord('A') + col_count - 1),
+                                        first_row + len(rows) - 1)
+            target = ComInterop.get(sheet, "Range",
+                                    "A{0}".format(first_row), last_cell)
+            ComInterop.set(target, "Value2", values)
         finally:
-            ComInterop.release(cell)
+            ComInterop.release(target)
 
 
 class FolderPicker(object):
+    DIALOG_TYPE_NAME = \
+        "Microsoft.WindowsAPICodePack.Dialogs.CommonOpenFileDialog, Microsoft.WindowsAPICodePack"
+    DIALOG_PROPERTIES = \
+        ("IsFolderPicker", "Multiselect", "Title", "InitialDirectory", "FileName")
+    # reflected dialog type and members, resolved on first use
+    _dialog_members = None
+
     @staticmethod
     def pick_folder(initial_path=None):
         picked = FolderPicker._try_common_dialog(initial_path)
@@ -718,25 +1190,40 @@ class FolderPicker(object):
         except Exception:
             return None
 
+    @staticmethod
+    def _get_dialog_members():
+        if FolderPicker._dialog_members is None:
+            members = {}
+            try:
+                dialog_type = Type.GetType(FolderPicker.DIALOG_TYPE_NAME)
+                if dialog_type is not None:
+                    for prop_name in FolderPicker.DIALOG_PROPERTIES:
+                        members[prop_name] = dialog_type.GetProperty(prop_name)
+                    members["ShowDialog"] = dialog_type.GetMethod("ShowDialog")
+                    members["type"] = dialog_type
+            except Exception:
+                members = {}
+            FolderPicker._dialog_members = members
+        return FolderPicker._dialog_members
+
     @staticmethod
     def _try_common_dialog(initial_path):
         try:
-            dialog_type = Type.GetType(
-                "Microsoft.WindowsAPICodePack.Dialogs.CommonOpenFileDialog, Microsoft.WindowsAPICodePack"
-            )
+            members = FolderPicker._get_dialog_members()
+            dialog_type = members.get("type")
             if dialog_type is None:
                 return None
 
             dialog = Activator.CreateInstance(dialog_type)
-            dialog_type.GetProperty("IsFolderPicker").SetValue(dialog, True, None)
-            dialog_type.GetProperty("Multiselect").SetValue(dialog, False, None)
-            dialog_type.GetProperty("Title").SetValue(dialog, "Select Output Folder", None)
+            members["IsFolderPicker"].SetValue(dialog, True, None)
+            members["Multiselect"].SetValue(dialog, False, None)
+            members["Title"].SetValue(dialog, "Select Output Folder", None)
             if initial_path:
-                prop = dialog_type.GetProperty("InitialDirectory")
+                prop = members["InitialDirectory"]
                 if prop is not None:
                     prop.SetValue(dialog, initial_path, None)
 
-            show_dialog = dialog_type.GetMethod("ShowDialog")
+            show_dialog = members["ShowDialog"]
             result = show_dialog.Invoke(dialog, None) if show_dialog else None
             ok = False
             if result is not None:
@@ -747,7 +1234,7 @@ class FolderPicker(object):
                     ok = text.lower() in ("ok", "1")
 
             if ok:
-                return dialog_type.GetProperty("FileName").GetValue(dialog, None)
+                return members["FileName"].GetValue(dialog, None)
         except Exception:
             return None
         return None
@@ -762,7 +1249,8 @@ class NamingFormat(forms.Reactive):
     @staticmethod
     def verify_template(value):
         """Verify template is valid"""
-        if not value.lower().endswith('.pdf'):
+        # only the extension needs a case-insensitive compare
+        if value[-4:].lower() != '.pdf':
             value += '.pdf'
         return value
 
@@ -789,41 +1277,57 @@ class ViewSheetListItem(forms.Reactive):
     """Revit Sheet show in Print Window"""
 
     def __init__(self, view_sheet, view_tblock,
-                 print_settings=None, rev_settings=None):
+                 print_settings=None, rev_settings=None, tblock_types=None):
         self._sheet = view_sheet
         self._tblock = view_tblock
         if self._tblock:
-            self._tblock_type = \
-                view_sheet.Document.GetElement(view_tblock.GetTypeId())
+            tblock_type_id = view_tblock.GetTypeId()
+            self._tblock_type = None
+            if tblock_types:
+                self._tblock_type = \
+                    tblock_types.get(get_elementid_value(tblock_type_id))
+            if self._tblock_type is None:
+                self._tblock_type = \
+                    view_sheet.Document.GetElement(tblock_type_id)
         else:
             self._tblock_type = None
         self.name = self._sheet.Name
         self.number = self._sheet.SheetNumber if hasattr(self._sheet, 'SheetNumber') else ''
+        issue_date_param = \
+            self._sheet.Parameter[DB.BuiltInParameter.SHEET_ISSUE_DATE]
         self.issue_date = \
-            self._sheet.Parameter[
-                DB.BuiltInParameter.SHEET_ISSUE_DATE].AsString() if self._sheet.Parameter[
-                DB.BuiltInParameter.SHEET_ISSUE_DATE] else ''
+            issue_date_param.AsString() if issue_date_param else ''
         self.printable = self._sheet.CanBePrinted
         self.revision_date_sortable = ""
         self._print_index = 0
         self._print_filename = ''
+        self._name_key = None
+        self._number_key = None
 
         self._tblock_psettings = print_settings
-        self._print_settings = self._tblock_psettings.psettings
-        self.all_print_settings = self._tblock_psettings.psettings
-        if self.all_print_settings:
-            self._print_settings = self.all_print_settings[0]
+        psettings = self._tblock_psettings.psettings
+        self._print_settings = psettings
+        self.all_print_settings = psettings
+        if psettings:
+            self._print_settings = psettings[0]
         self.read_only = self._tblock_psettings.set_by_param
 
         per_sheet_revisions = \
             rev_settings.RevisionNumbering == DB.RevisionNumbering.PerSheet \
             if rev_settings else False
-        cur_rev = revit.query.get_current_sheet_revision(self._sheet) if hasattr(self._sheet, 'GetCurrentRevision') else ''
+        cur_rev = None
+        if hasattr(self._sheet, 'GetCurrentRevision'):
+            cur_rev_id = self._sheet.GetCurrentRevision()
+            if cur_rev_id != DB.ElementId.InvalidElementId:
+                cur_rev = self._sheet.Document.GetElement(cur_rev_id)
         self.revision = UNSET_REVISION
         if cur_rev:
-            on_sheet = self._sheet if per_sheet_revisions else None
+            if per_sheet_revisions:
+                rev_number = self._sheet.GetRevisionNumberOnSheet(cur_rev_id)
+            else:
+                rev_number = cur_rev.RevisionNumber
             self.revision = SheetRevision(
-                number=revit.query.get_rev_number(cur_rev, sheet=on_sheet),
+                number=rev_number,
                 desc=cur_rev.Description,
                 date=cur_rev.RevisionDate,
                 is_set=True
@@ -846,6 +1350,20 @@ class ViewSheetListItem(forms.Reactive):
         """Revit titleblock type"""
         return self._tblock_type
 
+    @property
+    def name_key(self):
+        """Sheet name normalized for Excel row matching"""
+        if self._name_key is None:
+            self._name_key = normalize_match_text(self.name)
+        return self._name_key
+
+    @property
+    def number_key(self):
+        """Sheet number normalized for Excel row matching"""
+        if self._number_key is None:
+            self._number_key = normalize_match_text(self.number)
+        return self._number_key
+
     @forms.reactive
     def print_settings(self):
         """Sheet pring settings"""
@@ -884,6 +1402,15 @@ class PrintSettingListItem(forms.TemplateListItem):
             True if isinstance(self.item, DB.InSessionPrintSetting) \
                 else False
 
+    @classmethod
+    def from_psetting(cls, print_settings, compatible_sizes):
+        """Create item and mark it compatible with the printer paper sizes"""
+        psetting_item = cls(print_settings)
+        paper_size = psetting_item.paper_size
+        if paper_size and paper_size.Name in compatible_sizes:
+            psetting_item.is_compatible = True
+        return psetting_item
+
     @property
     def name(self):
         if isinstance(self.item, DB.InSessionPrintSetting):
@@ -950,18 +1477,21 @@ class EditNamingFormatsWindow(forms.WPFWindow):
         if not doc:
             return names
         try:
-            params = doc.ProjectInformation.Parameters
+            # one IList from the API instead of enumerating the ParameterSet
+            params = doc.ProjectInformation.GetOrderedParameters()
         except Exception:
             params = None
         if not params:
             return names
+        seen = set()
         try:
             for p in params:
                 try:
                     name = p.Definition.Name if p and p.Definition else None
                 except Exception:
                     name = None
-                if name and name not in names:
+                if name and name not in seen:
+                    seen.add(name)
                     names.append(name)
         except Exception:
             pass
@@ -973,108 +1503,7 @@ class EditNamingFormatsWindow(forms.WPFWindow):
 
     @staticmethod
     def get_default_formatters(doc=None):
-        formatters = [
-            NamingFormatter(
-                template='{index}',
-                desc='Print Index Number e.g. "0001"'
-            ),
-            NamingFormatter(
-                template='{number}',
-                desc='Sheet Number e.g. "A1.00"'
-            ),
-            NamingFormatter(
-                template='{name}',
-                desc='Sheet Name e.g. "1ST FLOOR PLAN"'
-            ),
-            NamingFormatter(
-                template='{name_dash}',
-                desc='Sheet Name (with - for space) e.g. "1ST-FLOOR-PLAN"'
-            ),
-            NamingFormatter(
-                template='{name_underline}',
-                desc='Sheet Name (with _ for space) e.g. "1ST_FLOOR_PLAN"'
-            ),
-            NamingFormatter(
-                template='{current_date}',
-                desc='Today''s Date e.g. "2019-10-12"'
-            ),
-            NamingFormatter(
-                template='{issue_date}',
-                desc='Sheet Issue Date e.g. "2019-10-12"'
-            ),
-            NamingFormatter(
-                template='{rev_number}',
-                desc='Revision Number e.g. "01"'
-            ),
-            NamingFormatter(
-                template='{rev_desc}',
-                desc='Revision Description e.g. "ASI01"'
-            ),
-            NamingFormatter(
-                template='{rev_date}',
-                desc='Revision Date e.g. "2019-10-12"'
-            ),
-            NamingFormatter(
-                template='{proj_name}',
-                desc='Project Name e.g. "MY_PROJECT"'
-            ),
-            NamingFormatter(
-                template='{proj_number}',
-                desc='Project Number e.g. "PR2019.12"'
-            ),
-            NamingFormatter(
-                template='{proj_building_name}',
-                desc='Project Building Name e.g. "BLDG01"'
-            ),
-            NamingFormatter(
-                template='{proj_issue_date}',
-                desc='Project Issue Date e.g. "2019-10-12"'
-            ),
-            NamingFormatter(
-                template='{proj_org_name}',
-                desc='Project Organization Name e.g. "MYCOMP"'
-            ),
-            NamingFormatter(
-                template='{proj_status}',
-                desc='Project Status e.g. "CD100"'
-            ),
-            NamingFormatter(
-                template='{username}',
-                desc='Active User e.g. "eirannejad"'
-            ),
-            NamingFormatter(
-                template='{revit_version}',
-                desc='Active Revit Version e.g. "2019"'
-            ),
-            NamingFormatter(
-                template='{excel_name}',
-                desc='Excel Drawing Name (Column B)'
-            ),
-            NamingFormatter(
-                template='{excel_number}',
-                desc='Excel Drawing Number (Column C)'
-            ),
-            NamingFormatter(
-                template='{sheet_param:PARAM_NAME}',
-                desc='Value of Given Sheet Parameter e.g. '
-                     'Replace PARAM_NAME with target parameter name'
-            ),
-            NamingFormatter(
-                template='{tblock_param:PARAM_NAME}',
-                desc='Value of Given TitleBlock Parameter e.g. '
-                     'Replace PARAM_NAME with target parameter name'
-            ),
-            NamingFormatter(
-                template='{proj_param:PARAM_NAME}',
-                desc='Value of Given Project Information Parameter e.g. '
-                     'Replace PARAM_NAME with target parameter name'
-            ),
-            NamingFormatter(
-                template='{glob_param:PARAM_NAME}',
-                desc='Value of Given Global Parameter. '
-                     'Replace PARAM_NAME with target parameter name'
-            ),
-        ]
+        formatters = list(DEFAULT_FORMATTERS)
 
         proj_params = EditNamingFormatsWindow._get_project_param_names(doc)
         for pname in proj_params:
@@ -1141,15 +1570,18 @@ class EditNamingFormatsWindow(forms.WPFWindow):
             EditNamingFormatsWindow.get_default_formatters(self._doc)
 
     def reset_naming_formats(self):
+        naming_formats = EditNamingFormatsWindow.get_naming_formats()
         self.formats_lb.ItemsSource = \
-                ObjectModel.ObservableCollection[object](
-                    EditNamingFormatsWindow.get_naming_formats()
-                )
+                ObjectModel.ObservableCollection[object](naming_formats)
+        # find the starting item in the python list, not the bound collection
         if isinstance(self._starting_item, NamingFormat):
-            for item in self.formats_lb.ItemsSource:
-                if item.name == self._starting_item.name:
-                    self.selected_naming_format = item
-                    break
+            start_name = self._starting_item.name
+            start_index = next(
+                (idx for idx, item in enumerate(naming_formats)
+                 if item.name == start_name),
+                None)
+            if start_index is not None:
+                self.formats_lb.SelectedIndex = start_index
 
     # https://www.wpftutorial.net/DragAndDrop.html
     def start_drag(self, sender, args):
@@ -1202,9 +1634,9 @@ class EditNamingFormatsWindow(forms.WPFWindow):
         naming_format = self.selected_naming_format
         if naming_format.builtin:
             return
-        item_index = self.naming_formats.IndexOf(naming_format)
-        self.naming_formats.Remove(naming_format)
-        next_index = min([item_index, self.naming_formats.Count-1])
+        item_index = self.formats_lb.SelectedIndex
+        self.naming_formats.RemoveAt(item_index)
+        next_index = min(item_index, self.naming_formats.Count-1)
         self.selected_naming_format = self.naming_formats[next_index]
 
     def save_formats(self, sender, args):
@@ -1249,49 +1681,46 @@ class ScheduleSheetList(object):
                              op.basename(schedule_data_file),
                              vseop)
 
-        sched_data = []
+        # streamed line by line; the export is never held in memory
         try:
             with codecs.open(schedule_data_file, 'r', EXPORT_ENCODING) \
                     as sched_data_file:
-                return [x.strip() for x in sched_data_file.readlines()]
+                for data_line in sched_data_file:
+                    yield data_line.strip()
         except Exception as open_err:
             logger.error('Error opening sheet index export: %s | %s',
                          schedule_data_file, open_err)
-            return sched_data
 
     def _order_sheets_by_schedule_data(self, view_shedule, sheet_list):
-        sched_data = self._get_schedule_text_data(view_shedule)
-
-        if not sched_data:
-            return sheet_list
+        sheet_list = list(sheet_list)
 
-        ordered_sheets_dict = {}
+        # schedule exports are tab separated; match whole cells against
+        # sheet numbers in a single pass over the schedule lines
+        sheets_by_number = {}
         for sheet in sheet_list:
-            logger.debug('finding index for: %s', sheet.SheetNumber)
-            for line_no, data_line in enumerate(sched_data):
-                match_pattern = r'(^|.*\t){}(\t.*|$)'.format(sheet.SheetNumber)
-                matches_sheet = re.match(match_pattern, data_line)
-                logger.debug('match: %s', matches_sheet)
-                try:
-                    if matches_sheet:
-                        ordered_sheets_dict[line_no] = sheet
-                        break
-                    if not sheet.CanBePrinted:
-                        logger.debug('Sheet %s is not printable.',
-                                     sheet.SheetNumber)
-                except Exception:
-                    continue
+            sheets_by_number.setdefault(sheet.SheetNumber, sheet)
+
+        has_data = False
+        ordered_sheets = []
+        for data_line in self._get_schedule_text_data(view_shedule):
+            has_data = True
+            for cell in data_line.split('\t'):
+                sheet = sheets_by_number.pop(cell, None)
+                if sheet is not None:
+                    logger.debug('found index for: %s', sheet.SheetNumber)
+                    ordered_sheets.append(sheet)
+                    break
 
-        sorted_keys = sorted(ordered_sheets_dict.keys())
-        return [ordered_sheets_dict[x] for x in sorted_keys]
+        if not has_data:
+            return sheet_list
+        return ordered_sheets
 
     def _get_ordered_schedule_sheets(self, doc):
         if doc == self.doc:
             sheets = DB.FilteredElementCollector(self.doc,
                                                  self.schedule.Id)\
-                    .OfClass(framework.get_type(DB.ViewSheet))\
-                    .WhereElementIsNotElementType()\
-                    .ToElements()
+                    .OfClass(VIEWSHEET_TYPE)\
+                    .WhereElementIsNotElementType()
 
             return self._order_sheets_by_schedule_data(
                 self.schedule,
@@ -1307,9 +1736,8 @@ class AllSheetsList(object):
 
     def get_sheets(self, doc):
         return DB.FilteredElementCollector(doc)\
-                 .OfClass(framework.get_type(DB.ViewSheet))\
-                 .WhereElementIsNotElementType()\
-                 .ToElements()
+                 .OfClass(VIEWSHEET_TYPE)\
+                 .WhereElementIsNotElementType()
 
 
 class UnlistedSheetsList(object):
@@ -1324,10 +1752,9 @@ class UnlistedSheetsList(object):
         value_rule = DB.FilterIntegerRule(param_prov, param_equality, 0)
         param_filter = DB.ElementParameterFilter(value_rule)
         return DB.FilteredElementCollector(doc)\
-                 .OfClass(framework.get_type(DB.ViewSheet))\
+                 .OfClass(VIEWSHEET_TYPE)\
                  .WherePasses(param_filter) \
-                 .WhereElementIsNotElementType()\
-                 .ToElements()
+                 .WhereElementIsNotElementType()
 
 
 
@@ -1340,6 +1767,23 @@ class PrintSheetsWindow(forms.WPFWindow):
         self._excel_rows_by_name = {}
         self._excel_rows_by_number = {}
         self._excel_path = ''
+        # existing sibling database file per normalized path
+        self._resolved_excel_paths = {}
+        # printer paper size names per (document, printer)
+        self._compatible_sizes = {}
+        # view sheet sets per document; dropped when a set is changed
+        self._viewsheetsets = {}
+        # keynote file modified times at last reload per (document, file)
+        self._keynote_mtimes = {}
+        # database file dialogs, created on first use
+        self._open_dialog = None
+        self._save_dialog = None
+        # revision date order from the user locale, set per naming run
+        self._dayfirst = True
+        # title block type param values, reset per naming run
+        self._tblock_type_values = {}
+        # project-wide naming field values, snapshotted per naming run
+        self._run_field_values = {}
         self._scheduler = None
         self._scheduled_execution = False
         self._suppress_csv_popups = False
@@ -1488,7 +1932,7 @@ class PrintSheetsWindow(forms.WPFWindow):
 
     def _get_sheet_index_list(self):
         schedules = DB.FilteredElementCollector(self.selected_doc)\
-                      .OfClass(framework.get_type(DB.ViewSchedule))\
+                      .OfClass(VIEWSCHEDULE_TYPE)\
                       .WhereElementIsNotElementType()\
                       .ToElements()
 
@@ -1537,16 +1981,22 @@ class PrintSheetsWindow(forms.WPFWindow):
             psetting_items = []
 
         psettings = psettings or revit.query.get_all_print_settings(doc=doc)
-        psetting_items.extend([PrintSettingListItem(x) for x in psettings])
+        if psettings:
+            compatible_sizes = self._get_compatible_sizes()
+            psetting_items.extend(
+                [PrintSettingListItem.from_psetting(x, compatible_sizes)
+                 for x in psettings]
+            )
+        return psetting_items
 
+    def _get_compatible_sizes(self):
         print_mgr = self._get_printmanager()
-        compatible_sizes = {x.Name for x in print_mgr.PaperSizes}
-        for psetting_item in psetting_items:
-            if isinstance(psetting_item, PrintSettingListItem):
-                if psetting_item.paper_size \
-                        and psetting_item.paper_size.Name in compatible_sizes:
-                    psetting_item.is_compatible = True
-        return psetting_items
+        sizes_key = (self.selected_doc, print_mgr.PrinterName)
+        compatible_sizes = self._compatible_sizes.get(sizes_key)
+        if compatible_sizes is None:
+            compatible_sizes = {x.Name for x in print_mgr.PaperSizes}
+            self._compatible_sizes[sizes_key] = compatible_sizes
+        return compatible_sizes
 
     def _setup_print_settings(self):
         psetting_items = \
@@ -1567,9 +2017,10 @@ class PrintSheetsWindow(forms.WPFWindow):
         else:
             self._init_psettings = print_mgr.PrintSetup.CurrentPrintSetting
             cur_psetting_name = print_mgr.PrintSetup.CurrentPrintSetting.Name
-            for psetting_item in psetting_items:
-                if psetting_item.name == cur_psetting_name:
-                    self.printsettings_cb.SelectedItem = psetting_item
+            psetting_items_by_name = {x.name: x for x in psetting_items}
+            cur_psetting_item = psetting_items_by_name.get(cur_psetting_name)
+            if cur_psetting_item is not None:
+                self.printsettings_cb.SelectedItem = cur_psetting_item
 
         if self.selected_doc.IsLinked:
             self.disable_element(self.printsettings_cb)
@@ -1587,14 +2038,22 @@ class PrintSheetsWindow(forms.WPFWindow):
             self.disable_element(self.combine_cb)
             self.combine_cb.IsChecked = False
 
+    def _get_viewsheetsets(self, force=False):
+        doc = self.selected_doc
+        sheetsets = self._viewsheetsets.get(doc)
+        if force or sheetsets is None:
+            sheetsets = list(
+                DB.FilteredElementCollector(doc)
+                .OfClass(VIEWSHEETSET_TYPE)
+                .WhereElementIsNotElementType()
+            )
+            self._viewsheetsets[doc] = sheetsets
+        return sheetsets
+
     def _setup_sheet_list(self):
         sheet_indices = self._get_sheet_index_list()
         try:
-            cl = DB.FilteredElementCollector(self.selected_doc)
-            sheetsets = cl.OfClass(framework.get_type(DB.ViewSheetSet)) \
-                        .WhereElementIsNotElementType() \
-                        .ToElements()
-            for ss in sheetsets:
+            for ss in self._get_viewsheetsets():
                 sheet_indices.append(SheetSetList(ss))
         except Exception as e:
             logger.warning("Could not load sheet sets: {}".format(e))
@@ -1608,13 +2067,26 @@ class PrintSheetsWindow(forms.WPFWindow):
         else:
             self.disable_element(self.schedules_cb)
 
-    def _get_output_root(self):
+    def _safe_text(self, attr, default=''):
+        text_box = getattr(self, attr, None)
+        if text_box is None:
+            return default
+        try:
+            return text_box.Text or default
+        except Exception:
+            return default
+
+    def _safe_set_text(self, attr, value):
+        text_box = getattr(self, attr, None)
+        if text_box is None:
+            return
         try:
-            if hasattr(self, 'output_dir_tb') and self.output_dir_tb and self.output_dir_tb.Text:
-                return self.output_dir_tb.Text
+            text_box.Text = value
         except Exception:
             pass
-        return PrintUtils.get_dir()
+
+    def _get_output_root(self):
+        return self._safe_text('output_dir_tb') or PrintUtils.get_dir()
 
     def _get_output_dir(self, task="_PRINT"):
         base = self._get_output_root()
@@ -1623,23 +2095,18 @@ class PrintSheetsWindow(forms.WPFWindow):
     def _ensure_pdf_extension(self, value):
         if not value:
             return value
-        val_lower = value.lower()
-        if val_lower.endswith('.dwg'):
+        tail = value[-4:].lower()
+        if tail == '.dwg':
             value = value[:-4]
-            val_lower = value.lower()
-        if not val_lower.endswith('.pdf'):
+            tail = value[-4:].lower()
+        if tail != '.pdf':
             return value + '.pdf'
         return value
 
     def _load_excel_rows(self):
         self._excel_rows_by_name = {}
         self._excel_rows_by_number = {}
-        path = ''
-        try:
-            path = self.excel_path_tb.Text if hasattr(self, 'excel_path_tb') else ''
-        except Exception:
-            path = ''
-        path = self._normalize_excel_path(path)
+        path = self._normalize_excel_path(self._safe_text('excel_path_tb'))
         self._excel_path = path
         if not path:
             return
@@ -1650,45 +2117,58 @@ class PrintSheetsWindow(forms.WPFWindow):
         if resolved_path != path:
             path = resolved_path
             self._excel_path = path
-            try:
-                self.excel_path_tb.Text = path
-            except Exception:
-                pass
+            self._safe_set_text('excel_path_tb', path)
         try:
-            rows = ExcelDatabase.read_print_rows(path)
+            rows = ExcelDatabase.iter_print_rows(path)
         except Exception as ex:
             forms.alert("Failed to read Excel file:\n{}\n{}".format(path, ex))
             return
 
+        # single pass; the first row for a key is the one kept
+        add_by_name = self._excel_rows_by_name.setdefault
+        add_by_number = self._excel_rows_by_number.setdefault
         for row in rows:
             drawing_name_key = normalize_match_text(row.DrawingName)
+            if drawing_name_key:
+                add_by_name(drawing_name_key, row)
             drawing_number_key = normalize_match_text(row.DrawingNumber)
-            if drawing_name_key and drawing_name_key not in self._excel_rows_by_name:
-                self._excel_rows_by_name[drawing_name_key] = row
-            if drawing_number_key and drawing_number_key not in self._excel_rows_by_number:
-                self._excel_rows_by_number[drawing_number_key] = row
+            if drawing_number_key:
+                add_by_number(drawing_number_key, row)
+
+    @contextlib.contextmanager
+    def _without_excel_rows(self):
+        """Hide the loaded database rows from file naming temporarily."""
+        rows_by_name = self._excel_rows_by_name
+        rows_by_number = self._excel_rows_by_number
+        self._excel_rows_by_name = {}
+        self._excel_rows_by_number = {}
+        try:
+            yield
+        finally:
+            self._excel_rows_by_name = rows_by_name
+            self._excel_rows_by_number = rows_by_number
 
     def _get_excel_row(self, sheet):
         if not sheet:
             return None
         try:
-            sheet_name_key = normalize_match_text(sheet.name)
-            sheet_number_key = normalize_match_text(sheet.number)
-            if sheet_name_key in self._excel_rows_by_name:
-                return self._excel_rows_by_name.get(sheet_name_key)
-            if sheet_number_key in self._excel_rows_by_number:
-                return self._excel_rows_by_number.get(sheet_number_key)
+            row = self._excel_rows_by_name.get(sheet.name_key)
+            if row is None:
+                row = self._excel_rows_by_number.get(sheet.number_key)
+            return row
         except Exception:
             return None
-        return None
 
     def _normalize_excel_path(self, path):
         path = (path or '').strip().strip('"')
         if not path:
             return ''
-        normalized = op.abspath(op.expanduser(path))
-        if not op.splitext(normalized)[1]:
-            normalized += '.csv'
+        normalized = NORMALIZED_EXCEL_PATHS.get(path)
+        if normalized is None:
+            normalized = op.abspath(op.expanduser(path))
+            if not op.splitext(normalized)[1]:
+                normalized += '.csv'
+            NORMALIZED_EXCEL_PATHS[path] = normalized
         return normalized
 
     def _resolve_excel_path(self, path):
@@ -1697,19 +2177,42 @@ class PrintSheetsWindow(forms.WPFWindow):
             return ''
         if op.exists(normalized):
             return normalized
+        # files can be created or removed between calls, so a cached
+        # sibling is only reused while it still exists
+        resolved = self._resolved_excel_paths.get(normalized)
+        if resolved and op.exists(resolved):
+            return resolved
         base, _ = op.splitext(normalized)
         for candidate_ext in ('.xlsx', '.xlsm', '.xls', '.csv'):
             candidate = base + candidate_ext
             if op.exists(candidate):
+                self._resolved_excel_paths[normalized] = candidate
                 return candidate
         return ''
 
-    def _pick_excel_file_path(self):
-        try:
+    def _get_open_dialog(self):
+        if self._open_dialog is None:
             dialog = OpenFileDialog()
             dialog.Filter = "Database Files (*.xlsx;*.xlsm;*.xls;*.csv)|*.xlsx;*.xlsm;*.xls;*.csv|Excel Files (*.xlsx;*.xlsm;*.xls)|*.xlsx;*.xlsm;*.xls|CSV Files (*.csv)|*.csv|All Files (*.*)|*.*"
             dialog.Multiselect = False
             dialog.CheckFileExists = True
+            self._open_dialog = dialog
+        return self._open_dialog
+
+    def _get_save_dialog(self):
+        if self._save_dialog is None:
+            dialog = SaveFileDialog()
+            dialog.Filter = "CSV Files (*.csv)|*.csv|Excel Files (*.xlsx)|*.xlsx|All Files (*.*)|*.*"
+            dialog.DefaultExt = "csv"
+            dialog.AddExtension = True
+            dialog.OverwritePrompt = True
+            self._save_dialog = dialog
+        return self._save_dialog
+
+    def _pick_excel_file_path(self):
+        try:
+            dialog = self._get_open_dialog()
+            dialog.FileName = ''
             if dialog.ShowDialog():
                 return dialog.FileName
         except Exception:
@@ -1718,11 +2221,7 @@ class PrintSheetsWindow(forms.WPFWindow):
 
     def _save_excel_file_path(self, current_path=''):
         try:
-            dialog = SaveFileDialog()
-            dialog.Filter = "CSV Files (*.csv)|*.csv|Excel Files (*.xlsx)|*.xlsx|All Files (*.*)|*.*"
-            dialog.DefaultExt = "csv"
-            dialog.AddExtension = True
-            dialog.OverwritePrompt = True
+            dialog = self._get_save_dialog()
             normalized_current = self._normalize_excel_path(current_path)
             if normalized_current:
                 current_dir = op.dirname(normalized_current)
@@ -1742,50 +2241,37 @@ class PrintSheetsWindow(forms.WPFWindow):
         if not excel_file:
             return
         excel_file = self._normalize_excel_path(excel_file)
-        try:
-            self.excel_path_tb.Text = excel_file
-        except Exception:
-            pass
+        self._safe_set_text('excel_path_tb', excel_file)
         self._load_excel_rows()
         self.options_changed(None, None)
 
     def generate_excel(self, sender, args):
-        path = ''
-        try:
-            path = self.excel_path_tb.Text
-        except Exception:
-            path = ''
-        path = self._normalize_excel_path(path)
+        path = self._normalize_excel_path(self._safe_text('excel_path_tb'))
         if not path:
             path = self._save_excel_file_path(path)
             if not path:
                 return
         path = self._normalize_excel_path(path)
         parent_dir = op.dirname(path)
-        if parent_dir and not op.exists(parent_dir):
-            os.makedirs(parent_dir)
-        try:
-            self.excel_path_tb.Text = path
-        except Exception:
-            pass
+        if parent_dir:
+            PrintUtils.ensure_dir(parent_dir)
+        self._safe_set_text('excel_path_tb', path)
 
-        sheets = []
         try:
-            if self.sheet_list:
-                sheets = [x.revit_sheet for x in self.sheet_list if x and x.revit_sheet]
+            sheets = [x.revit_sheet for x in (self.sheet_list or ())
+                      if x and x.revit_sheet]
         except Exception:
             sheets = []
         if not sheets:
             try:
-                sheets = DB.FilteredElementCollector(self.selected_doc)\
-                         .OfClass(framework.get_type(DB.ViewSheet))\
-                         .WhereElementIsNotElementType()\
-                         .ToElements()
+                sheets = list(DB.FilteredElementCollector(self.selected_doc)
+                              .OfClass(VIEWSHEET_TYPE)
+                              .WhereElementIsNotElementType())
             except Exception:
                 sheets = []
         try:
             path = op.abspath(ExcelDatabase.generate_or_update(path, sheets))
-            self.excel_path_tb.Text = path
+            self._safe_set_text('excel_path_tb', path)
             forms.alert("Excel updated:\n{}".format(path), ok=True)
         except Exception as ex:
             forms.alert("CSV update failed:\n{}\n{}".format(path, ex))
@@ -1795,21 +2281,26 @@ class PrintSheetsWindow(forms.WPFWindow):
         self.options_changed(None, None)
 
     def browse_output(self, sender, args):
-        current = ''
-        try:
-            current = self.output_dir_tb.Text
-        except Exception:
-            current = ''
-        folder = FolderPicker.pick_folder(current)
+        folder = FolderPicker.pick_folder(self._safe_text('output_dir_tb'))
         if not folder:
             return
+        self._safe_set_text('output_dir_tb', folder)
+
+    @staticmethod
+    def _list_output_files(dir_path):
+        """Lower-case paths of the files already in the output folder."""
         try:
-            self.output_dir_tb.Text = folder
+            return {op.join(dir_path, x).lower() for x in os.listdir(dir_path)}
         except Exception:
-            pass
+            return set()
 
-    def _verify_print_filename(self, sheet_name, sheet_print_filepath):
-        if op.exists(sheet_print_filepath):
+    def _verify_print_filename(self, sheet_name, sheet_print_filepath,
+                               existing_files=None):
+        if existing_files is None:
+            file_exists = op.exists(sheet_print_filepath)
+        else:
+            file_exists = sheet_print_filepath.lower() in existing_files
+        if file_exists:
             logger.warning(
                 "Skipping sheet \"%s\" "
                 "File already exist at %s.",
@@ -1818,6 +2309,29 @@ class PrintSheetsWindow(forms.WPFWindow):
             return False
         return True
 
+    def _reload_keynotes(self, doc):
+        keynote_table = DB.KeynoteTable.GetKeynoteTable(doc)
+        keynote_key = keynote_mtime = None
+        try:
+            keynote_ref = keynote_table.GetExternalFileReference()
+            if keynote_ref is None:
+                # no keynote file to reload
+                return
+            keynote_path = DB.ModelPathUtils.ConvertModelPathToUserVisiblePath(
+                keynote_ref.GetAbsolutePath())
+            keynote_mtime = op.getmtime(keynote_path)
+            keynote_key = (doc.PathName, keynote_path)
+        except Exception:
+            # server hosted or missing files are always reloaded
+            keynote_key = None
+        if keynote_key and self._keynote_mtimes.get(keynote_key) == keynote_mtime:
+            return
+
+        with revit.Transaction('Reload Keynote File', doc=doc):
+            keynote_table.Reload(None)
+        if keynote_key:
+            self._keynote_mtimes[keynote_key] = keynote_mtime
+
     def _print_combined_sheets_in_order(self, target_sheets):
         if not self.export_pdf_enabled:
             forms.alert("Export PDF is disabled.")
@@ -1861,26 +2375,23 @@ class PrintSheetsWindow(forms.WPFWindow):
                 original_sheetnums = []
                 with revit.Transaction('Fix Sheet Numbers',
                                     doc=self.selected_doc):
-                    for idx, sheet in enumerate(target_sheets):
+                    prefix = ''
+                    for sheet in target_sheets:
                         rvtsheet = sheet.revit_sheet
                         # removing any NPC from previous failed prints
-                        if NPC in rvtsheet.SheetNumber:
-                            rvtsheet.SheetNumber = \
-                                rvtsheet.SheetNumber.replace(NPC, '')
+                        sheet_number = rvtsheet.SheetNumber.replace(NPC, '')
                         # create a list of the existing sheet numbers
-                        original_sheetnums.append(rvtsheet.SheetNumber)
-                        # add a prefix (NPC) for sorting purposes
-                        rvtsheet.SheetNumber = \
-                            NPC * (idx + 1) + rvtsheet.SheetNumber
+                        original_sheetnums.append(sheet_number)
+                        # add a prefix (NPC) for sorting purposes,
+                        # one character longer than the previous sheet's
+                        prefix += NPC
+                        rvtsheet.SheetNumber = prefix + sheet_number
                         if sheet.printable:
                             sheet_set.Insert(rvtsheet)
 
             # Collect existing sheet sets
-            cl = DB.FilteredElementCollector(self.selected_doc)
-            viewsheetsets = cl.OfClass(framework.get_type(DB.ViewSheetSet))\
-                              .WhereElementIsNotElementType()\
-                              .ToElements()
-            all_viewsheetsets = {vss.Name: vss for vss in viewsheetsets}
+            all_viewsheetsets = \
+                {vss.Name: vss for vss in self._get_viewsheetsets()}
 
             sheetsetname = 'OrderedPrintSet'
 
@@ -1891,6 +2402,7 @@ class PrintSheetsWindow(forms.WPFWindow):
                     print_mgr.ViewSheetSetting.CurrentViewSheetSet = \
                         all_viewsheetsets[sheetsetname]
                     print_mgr.ViewSheetSetting.Delete()
+                    self._viewsheetsets.pop(self.selected_doc, None)
 
             with revit.Transaction('Update Ordered Print Set',
                                    doc=self.selected_doc):
@@ -1904,6 +2416,7 @@ class PrintSheetsWindow(forms.WPFWindow):
                         viewsheet_settings.CurrentViewSheetSet.Views = \
                             sheet_set
                     viewsheet_settings.SaveAs(sheetsetname)
+                    self._viewsheetsets.pop(self.selected_doc, None)
                 except Exception as viewset_err:
                     sheet_report = ''
                     for sheet in sheet_set:
@@ -1933,9 +2446,7 @@ class PrintSheetsWindow(forms.WPFWindow):
             print_mgr.PrintToFile = True
             print_mgr.PrintToFileName = print_filepath
 
-            with revit.Transaction('Reload Keynote File',
-                                   doc=self.selected_doc):
-                DB.KeynoteTable.GetKeynoteTable(revit.doc).Reload(None)
+            self._reload_keynotes(self.selected_doc)
             
             print_mgr.Apply()
             print_mgr.SubmitPrint()
@@ -1966,15 +2477,8 @@ class PrintSheetsWindow(forms.WPFWindow):
             forms.alert("Enable PDF and/or DWG export.")
             return
 
-        if self.export_pdf_enabled or self.export_dwg_enabled:
-            PrintUtils.open_dir(dirPath)
-        else:
-            return
-
 
-        with revit.Transaction('Reload Keynote File',
-                               doc=self.selected_doc):
-            DB.KeynoteTable.GetKeynoteTable(self.selected_doc).Reload(None)
+        self._reload_keynotes(self.selected_doc)
 
         with revit.DryTransaction('Set Printer Settings',
                                   doc=self.selected_doc):
@@ -1990,123 +2494,81 @@ class PrintSheetsWindow(forms.WPFWindow):
                     expanded=str(cpSetEx)
                     )
                 return
-            if target_sheets:
-                if self.export_pdf_enabled and self.export_dwg_enabled:
-                    with forms.ProgressBar(step=1, title='Exporting PDF & DWGs... ' + '{value} of {max_value}', cancellable=(not self._scheduled_execution)) as pb1:
-                        pbTotal1 = len(target_sheets) * 2
-                        pbCount1 = 1
-                        for sheet in target_sheets:
-                            if pb1.cancelled:
-                                break
-                            else:
-                                if sheet.printable:
-                                    if sheet.print_filename:
-                                        print_filepath = op.join(dirPath, sheet.print_filename)
-                                        print_mgr.PrintToFileName = print_filepath
-
-                                        if per_sheet_psettings:
-                                            print_mgr.PrintSetup.CurrentPrintSetting = \
-                                                sheet.print_settings
-
-                                        if self._verify_print_filename(sheet.name,
-                                                                    print_filepath):
-                                            try:
-                                                pb1.update_progress(pbCount1, pbTotal1)
-                                                pbCount1 += 1
-                                                if IS_REVIT_2022_OR_NEWER:
-                                                    optspdf = PrintUtils.pdf_opts()
-                                                    PrintUtils.export_sheet_pdf(dirPath, sheet.revit_sheet, optspdf, doc, sheet.print_filename)
-                                                else:
-                                                    print_mgr.SubmitPrint(sheet.revit_sheet)
-                                            except Exception as e:
-                                                logger.error('Failed to export PDF for sheet %s: %s', sheet.number, e)
-
-                                            try:
-                                                pb1.update_progress(pbCount1, pbTotal1)
-                                                pbCount1 += 1
-                                                optsdwg = PrintUtils.dwg_opts()
-                                                PrintUtils.export_sheet_dwg(dirPath, sheet.revit_sheet, optsdwg, doc, sheet.print_filename)
-                                            except Exception as e:
-                                                logger.error('Failed to export DWG for sheet %s: %s', sheet.number, e)
-                                    else:
-                                        pbCount1 += 2
-                                        logger.debug(
-                                            'Sheet %s does not have a valid file name.',
-                                            sheet.number)
-                                else:
-                                    pbCount1 += 2
-                                    logger.debug('Sheet %s is not printable. Skipping print.',
-                                                sheet.number)
-                elif self.export_pdf_enabled:
-                    with forms.ProgressBar(step=1, title='Exporting PDFs... ' + '{value} of {max_value}', cancellable=(not self._scheduled_execution)) as pb1:
-                        pbTotal1 = len(target_sheets)
-                        pbCount1 = 1
-                        for sheet in target_sheets:
-                            if pb1.cancelled:
-                                break
-                            else:
-                                if sheet.printable:
-                                    if sheet.print_filename:
-                                        print_filepath = op.join(dirPath, sheet.print_filename)
-                                        print_mgr.PrintToFileName = print_filepath
-
-                                        if per_sheet_psettings:
-                                            print_mgr.PrintSetup.CurrentPrintSetting = \
-                                                sheet.print_settings
-
-                                        if self._verify_print_filename(sheet.name,
-                                                                    print_filepath):
-                                            try:
-                                                pb1.update_progress(pbCount1, pbTotal1)
-                                                pbCount1 += 1
-                                                if IS_REVIT_2022_OR_NEWER:
-                                                    optspdf = PrintUtils.pdf_opts()
-                                                    PrintUtils.export_sheet_pdf(dirPath, sheet.revit_sheet, optspdf, doc, sheet.print_filename)
-                                                else:
-                                                    print_mgr.SubmitPrint(sheet.revit_sheet)
-                                            except Exception as e:
-                                                logger.error('Failed to export PDF for sheet %s: %s', sheet.number, e)
-
-                                    else:
-                                        pbCount1 += 1
-                                        logger.debug(
-                                            'Sheet %s does not have a valid file name.',
-                                            sheet.number)
-                                else:
-                                    pbCount1 += 1
-                                    logger.debug('Sheet %s is not printable. Skipping print.',
-                                                sheet.number)
-                elif self.export_dwg_enabled:
-                    with forms.ProgressBar(step=1, title='Exporting DWGs... ' + '{value} of {max_value}', cancellable=(not self._scheduled_execution)) as pb1:
-                        pbTotal1 = len(target_sheets)
-                        pbCount1 = 1
-                        for sheet in target_sheets:
-                            if pb1.cancelled:
-                                break
-                            else:
-                                if sheet.printable:
-                                    if sheet.print_filename:
-                                        print_filepath = op.join(dirPath, sheet.print_filename)
-                                        if per_sheet_psettings:
-                                            print_mgr.PrintSetup.CurrentPrintSetting = \
-                                                sheet.print_settings
-                                        if self._verify_print_filename(sheet.name, print_filepath):
-                                            try:
-                                                pb1.update_progress(pbCount1, pbTotal1)
-                                                pbCount1 += 1
-                                                optsdwg = PrintUtils.dwg_opts()
-                                                PrintUtils.export_sheet_dwg(dirPath, sheet.revit_sheet, optsdwg, doc, sheet.print_filename)
-                                            except Exception as e:
-                                                logger.error('Failed to export DWG for sheet %s: %s', sheet.number, e)
-                                    else:
-                                        pbCount1 += 1
-                                        logger.debug(
-                                            'Sheet %s does not have a valid file name.',
-                                            sheet.number)
-                                else:
-                                    pbCount1 += 1
-                                    logger.debug('Sheet %s is not printable. Skipping print.',
-                                                sheet.number)
+            # shared by all sheets; exports only change the file name
+            optspdf = PrintUtils.pdf_opts() \
+                if self.export_pdf_enabled and IS_REVIT_2022_OR_NEWER else None
+            optsdwg = PrintUtils.dwg_opts() if self.export_dwg_enabled else None
+            # printable sheets with a file name, resolved before exporting
+            jobs = []
+            for sheet in target_sheets:
+                if not sheet.printable:
+                    logger.debug('Sheet %s is not printable. Skipping print.',
+                                 sheet.number)
+                elif not sheet.print_filename:
+                    logger.debug('Sheet %s does not have a valid file name.',
+                                 sheet.number)
+                else:
+                    jobs.append((sheet, op.join(dirPath, sheet.print_filename)))
+            if not jobs:
+                return
+            # one folder listing instead of a file check per sheet
+            existing_files = self._list_output_files(dirPath)
+
+            # one (label, export function) pair per enabled output format
+            exporters = []
+            if self.export_pdf_enabled:
+                if IS_REVIT_2022_OR_NEWER:
+                    exporters.append(
+                        ('PDF',
+                         lambda sheet: PrintUtils.export_sheet_pdf(
+                             dirPath, sheet.revit_sheet, optspdf, doc,
+                             sheet.print_filename)))
+                else:
+                    exporters.append(
+                        ('PDF',
+                         lambda sheet: print_mgr.SubmitPrint(sheet.revit_sheet)))
+            if self.export_dwg_enabled:
+                exporters.append(
+                    ('DWG',
+                     lambda sheet: PrintUtils.export_sheet_dwg(
+                         dirPath, sheet.revit_sheet, optsdwg, doc,
+                         sheet.print_filename)))
+
+            if self.export_pdf_enabled and self.export_dwg_enabled:
+                pb_title = 'Exporting PDF & DWGs... '
+            elif self.export_pdf_enabled:
+                pb_title = 'Exporting PDFs... '
+            else:
+                pb_title = 'Exporting DWGs... '
+            with forms.ProgressBar(step=1, title=pb_title + '{value} of {max_value}', cancellable=(not self._scheduled_execution)) as pb1:
+                pbTotal1 = len(jobs) * len(exporters)
+                pbCount1 = 1
+                # opened after the first export; never on scheduled runs
+                dir_opened = self._scheduled_execution
+                for sheet, print_filepath in jobs:
+                    if pb1.cancelled:
+                        break
+                    if self.export_pdf_enabled:
+                        print_mgr.PrintToFileName = print_filepath
+                    if per_sheet_psettings:
+                        print_mgr.PrintSetup.CurrentPrintSetting = \
+                            sheet.print_settings
+                    if not self._verify_print_filename(sheet.name,
+                                                       print_filepath,
+                                                       existing_files):
+                        continue
+                    existing_files.add(print_filepath.lower())
+
+                    for label, export_sheet in exporters:
+                        try:
+                            pb1.update_progress(pbCount1, pbTotal1)
+                            pbCount1 += 1
+                            export_sheet(sheet)
+                            if not dir_opened:
+                                PrintUtils.open_dir(dirPath)
+                                dir_opened = True
+                        except Exception as e:
+                            logger.error('Failed to export %s for sheet %s: %s', label, sheet.number, e)
 
     def _print_linked_sheets_in_order(self, target_sheets, target_doc):
         if not self.export_pdf_enabled:
@@ -2122,16 +2584,20 @@ class PrintSheetsWindow(forms.WPFWindow):
         dirPath = self._get_output_dir("_PRINT")
         doc = target_doc
 
-        if IS_REVIT_2022_OR_NEWER:
-            PrintUtils.open_dir(dirPath)
-        else:
+        if not IS_REVIT_2022_OR_NEWER:
             return
 
         if target_sheets:
+            # shared by all sheets; exports only change the file name
+            optspdf = PrintUtils.pdf_opts()
+            # one folder listing instead of a file check per sheet
+            existing_files = self._list_output_files(dirPath)
             with forms.ProgressBar(step=1, title='Exporting Linked PDFs... ' + '{value} of {max_value}', cancellable=(not self._scheduled_execution)) as pb1:
                 
                 pbTotal1 = len(target_sheets)
                 pbCount1 = 1
+                # opened after the first export; never on scheduled runs
+                dir_opened = self._scheduled_execution
                 for sheet in target_sheets:
                     if pb1.cancelled:
                         break
@@ -2142,15 +2608,19 @@ class PrintSheetsWindow(forms.WPFWindow):
                                 print_mgr.PrintToFileName = print_filepath
 
                                 if self._verify_print_filename(sheet.name,
-                                                            print_filepath):
+                                                            print_filepath,
+                                                            existing_files):
+                                    existing_files.add(print_filepath.lower())
                                     try:
                                         pb1.update_progress(pbCount1, pbTotal1)
                                         pbCount1 += 1
                                         if IS_REVIT_2022_OR_NEWER:
-                                            optspdf = PrintUtils.pdf_opts()
                                             PrintUtils.export_sheet_pdf(dirPath, sheet.revit_sheet, optspdf, doc, sheet.print_filename)
                                         else:
                                             print_mgr.SubmitPrint(sheet.revit_sheet)
+                                        if not dir_opened:
+                                            PrintUtils.open_dir(dirPath)
+                                            dir_opened = True
                                     except Exception as e:
                                         logger.error('Failed to export PDF for sheet %s: %s', sheet.number, e)
                             else:
@@ -2176,93 +2646,64 @@ class PrintSheetsWindow(forms.WPFWindow):
 
     def _update_print_indices(self, sheet_list):
         start_idx = self.index_start
+        format_index = make_index_formatter(self.index_digits)
         for idx, sheet in enumerate(sheet_list):
-            sheet.print_index = INDEX_FORMAT\
-                .format(digits=self.index_digits)\
-                .format(idx + start_idx)
-
-    def _update_filename_template(self, template, value_type, value_getter):
-        finder_pattern = r'{' + value_type + r':(.*?)}'
-        for param_name in re.findall(finder_pattern, template):
-            param_value = value_getter(param_name)
-            repl_pattern = r'{' + value_type + ':' + param_name + r'}'
-            if param_value:
-                template = re.sub(repl_pattern, str(param_value), template)
-            template = re.sub(repl_pattern, '', template)
-        return template
+            sheet.print_index = format_index(idx + start_idx)
 
-    def _update_print_filename(self, template, sheet, excel_row=None):
-        # resolve sheet-level custom param values
-        ## get titleblock param values
-        template = self._update_filename_template(
-            template=template,
-            value_type='tblock_param',
-            value_getter=lambda x: revit.query.get_param_value(
-                    revit.query.get_param(sheet.revit_tblock, x)
-                ) or revit.query.get_param_value(
-                    revit.query.get_param(sheet.revit_tblock_type, x)
-                )
-        )
-
-        ## get sheet param values
-        template = self._update_filename_template(
-            template=template,
-            value_type='sheet_param',
-            value_getter=lambda x: revit.query.get_param_value(
-                revit.query.get_param(sheet.revit_sheet, x)
-                )
-        )
+    @staticmethod
+    def _update_filename_template(template, value_getters):
+        """Resolve custom param tokens using getters per value type."""
+        def resolve_token(match):
+            value_type, param_name = match.groups()
+            param_value = value_getters[value_type](param_name)
+            return str(param_value) if param_value else ''
 
-        ## get date for sortable list
-        rev_date_str = sheet.revision.date or ""
-        sortable_date = ""
+        return CUSTOM_PARAM_FINDER.sub(resolve_token, template)
 
+    @staticmethod
+    def _is_locale_dayfirst():
         # Try to detect user's locale
         locale_tuple = locale.getdefaultlocale()
         user_locale = (locale_tuple[0] if locale_tuple and locale_tuple[0] else "en_GB")
-        dayfirst = not user_locale.startswith("en_US")
-
-        # Try several common patterns
-        date_formats = ["%d.%m.%y", "%m.%d.%y", "%d/%m/%y", "%m/%d/%y"]
-        if not dayfirst:
-            date_formats = ["%m.%d.%y", "%m/%d/%y", "%d.%m.%y", "%d/%m/%y"]
+        return not user_locale.startswith("en_US")
+
+    def _get_run_field_values(self):
+        project_info = self.project_info
+        return {
+            'current_date': coreutils.current_date(),
+            'proj_name': project_info.name,
+            'proj_number': project_info.number,
+            'proj_building_name': project_info.building_name,
+            'proj_issue_date': project_info.issue_date,
+            'proj_org_name': project_info.org_name,
+            'proj_status': project_info.status,
+            'username': HOST_APP.username,
+            'revit_version': HOST_APP.version,
+        }
 
-        for fmt in date_formats:
-            try:
-                parsed = datetime.datetime.strptime(rev_date_str, fmt)
-                sortable_date = parsed.strftime("%Y%m%d")
-                break
-            except (ValueError, TypeError):
-                continue
+    def _update_print_filename(self, template, sheet, excel_row=None):
+        ## get date for sortable list
+        sheet.revision_date_sortable = \
+            make_sortable_date(sheet.revision.date, self._dayfirst)
 
-        sheet.revision_date_sortable = sortable_date
-        
+        # literal file names e.g. already resolved in the database
+        if '{' not in template and '}' not in template:
+            sheet.print_filename = template
+            return
 
-        # resolved the fixed formatters
+        # resolved the fixed formatters used by the template;
+        # unknown fields are left for format to report
         try:
-            output_fname = \
-                template.format(
-                    index=sheet.print_index,
-                    number=sheet.number,
-                    name=sheet.name,
-                    name_dash=sheet.name.replace(' ', '-'),
-                    name_underline=sheet.name.replace(' ', '_'),
-                    current_date=coreutils.current_date(),
-                    issue_date=sheet.issue_date,
-                    rev_number=sheet.revision.number if sheet.revision else '',
-                    rev_desc=sheet.revision.desc if sheet.revision else '',
-                    rev_date=sheet.revision.date if sheet.revision else '',
-                    proj_name=self.project_info.name,
-                    proj_number=self.project_info.number,
-                    proj_building_name=self.project_info.building_name,
-                    proj_issue_date=self.project_info.issue_date,
-                    proj_org_name=self.project_info.org_name,
-                    proj_status=self.project_info.status,
-                    username=HOST_APP.username,
-                    revit_version=HOST_APP.version,
-                    excel_name=excel_row.DrawingName if excel_row else '',
-                    excel_number=excel_row.DrawingNumber if excel_row else '',
-                )
+            run_values = self._run_field_values
+            field_values = {}
+            for field_name in get_template_fields(template):
+                if field_name in run_values:
+                    field_values[field_name] = run_values[field_name]
+                    continue
+                resolver = FILENAME_FIELD_RESOLVERS.get(field_name)
+                if resolver:
+                    field_values[field_name] = resolver(sheet, excel_row)
+            output_fname = template.format(**field_values)
         except Exception as ferr:
             if excel_row and excel_row.PrintFileName:
                 output_fname = self._ensure_pdf_extension(excel_row.PrintFileName)
@@ -2277,53 +2718,53 @@ class PrintSheetsWindow(forms.WPFWindow):
         doc = self.selected_doc
         naming_fmt = self.selected_naming_format
         base_template = naming_fmt.template if naming_fmt else ''
-        try:
-            current_excel_path = self.excel_path_tb.Text if hasattr(self, 'excel_path_tb') else ''
-        except Exception:
-            current_excel_path = ''
+        current_excel_path = self._safe_text('excel_path_tb')
         if current_excel_path and current_excel_path != self._excel_path:
             self._load_excel_rows()
+        self._dayfirst = self._is_locale_dayfirst()
+        self._tblock_type_values = {}
+        self._run_field_values = self._get_run_field_values()
+        proj_param_getter = partial(get_project_param_value, doc)
+        glob_param_getter = partial(get_global_param_value, doc)
 
         for sheet in sheet_list:
             excel_row = self._get_excel_row(sheet)
             sheet_template = excel_row.PrintFileName if excel_row and excel_row.PrintFileName else base_template
             sheet_template = self._ensure_pdf_extension(sheet_template)
 
-            # resolve project-level custom param values
-            sheet_template = self._update_filename_template(
-                template=sheet_template,
-                value_type='proj_param',
-                value_getter=lambda x: revit.query.get_param_value(
-                    doc.ProjectInformation.LookupParameter(x)
-                    )
-            )
-
-            sheet_template = self._update_filename_template(
-                template=sheet_template,
-                value_type='glob_param',
-                value_getter=lambda x: revit.query.get_param_value(
-                    revit.query.get_global_parameter(x, doc=doc)
-                    )
-            )
+            # resolve project and sheet-level custom param values
+            if '_param:' in sheet_template:
+                sheet_template = self._update_filename_template(
+                    sheet_template,
+                    {
+                        'proj_param': proj_param_getter,
+                        'glob_param': glob_param_getter,
+                        'tblock_param': partial(get_tblock_param_value,
+                                                sheet,
+                                                self._tblock_type_values),
+                        'sheet_param': partial(get_sheet_param_value, sheet),
+                    }
+                )
 
             self._update_print_filename(sheet_template, sheet, excel_row)
 
-    def _find_sheet_tblock(self, revit_sheet, tblocks):
-        for tblock in tblocks:
-            view_sheet = revit_sheet.Document.GetElement(tblock.OwnerViewId)
-            if view_sheet.Id == revit_sheet.Id:
-                return tblock
-
     def _get_sheet_printsettings(self, tblocks, psettings):
         tblock_printsettings = {}
         sheet_printsettings = {}
+        # "Print Setting" type param results per tblock type id
+        type_psettings = {}
+        # first print setting with each name
+        psettings_by_name = {}
+        for psetting in psettings:
+            psettings_by_name.setdefault(psetting.Name, psetting)
         for tblock in tblocks:
             tblock_psetting = None
             sheet = self.selected_doc.GetElement(tblock.OwnerViewId)
             # build a unique id for this tblock
             tblock_tform = tblock.GetTotalTransform()
-            tblock_tid = get_elementid_value(tblock.GetTypeId())
-            tblock_tid = tblock_tid * 100 \
+            tblock_type_id = tblock.GetTypeId()
+            tblock_type_key = get_elementid_value(tblock_type_id)
+            tblock_tid = tblock_type_key * 100 \
                          + tblock_tform.BasisX.X * 10 \
                          + tblock_tform.BasisX.Y
             # can not use None as default. see notes below
@@ -2334,23 +2775,22 @@ class PrintSheetsWindow(forms.WPFWindow):
             # otherwise, analyse the tblock and determine print settings
             else:
                 # try the type parameter "Print Setting"
-                tblock_type = tblock.Document.GetElement(tblock.GetTypeId())
-                if tblock_type:
-                    psparam = tblock_type.LookupParameter("Print Setting")
-                    if psparam:
-                        psetting_name = psparam.AsString()
-                        psparam_psetting = \
-                            next(
-                                (x for x in psettings
-                                    if x.Name == psetting_name),
-                                None
-                            )
-                        if psparam_psetting:
-                            tblock_psetting = \
-                                TitleBlockPrintSettings(
-                                    psettings=[psparam_psetting],
-                                    set_by_param=True
-                                )
+                if tblock_type_key in type_psettings:
+                    tblock_psetting = type_psettings[tblock_type_key]
+                else:
+                    tblock_type = tblock.Document.GetElement(tblock_type_id)
+                    if tblock_type:
+                        psparam = tblock_type.LookupParameter("Print Setting")
+                        if psparam:
+                            psparam_psetting = \
+                                psettings_by_name.get(psparam.AsString())
+                            if psparam_psetting:
+                                tblock_psetting = \
+                                    TitleBlockPrintSettings(
+                                        psettings=[psparam_psetting],
+                                        set_by_param=True
+                                    )
+                    type_psettings[tblock_type_key] = tblock_psetting
                 # otherwise, try to detect applicable print settings
                 # based on title block geometric properties
                 if not tblock_psetting:
@@ -2397,6 +2837,18 @@ class PrintSheetsWindow(forms.WPFWindow):
         )
         if self.selected_sheetlist and self.has_print_settings:
             rev_cfg = DB.RevisionSettings.GetRevisionSettings(revit.doc)
+            # fetch each title block type once for all sheet items
+            tblock_types = {}
+            # first title block placed on each sheet
+            sheet_tblocks = {}
+            for tblock in tblocks:
+                sheet_tblocks.setdefault(
+                    get_elementid_value(tblock.OwnerViewId), tblock)
+                tblock_type_id = tblock.GetTypeId()
+                tblock_type_key = get_elementid_value(tblock_type_id)
+                if tblock_type_key not in tblock_types:
+                    tblock_types[tblock_type_key] = \
+                        self.selected_doc.GetElement(tblock_type_id)
             if self.selected_print_setting.allows_variable_paper:
                 sheet_printsettings = \
                     self._get_sheet_printsettings(
@@ -2410,11 +2862,13 @@ class PrintSheetsWindow(forms.WPFWindow):
                 self._scheduled_sheets = [
                     ViewSheetListItem(
                         view_sheet=x,
-                        view_tblock=self._find_sheet_tblock(x, tblocks),
+                        view_tblock=sheet_tblocks.get(
+                            get_elementid_value(x.Id)),
                         print_settings=sheet_printsettings.get(
                             x.SheetNumber,
                             None),
-                        rev_settings=rev_cfg)
+                        rev_settings=rev_cfg,
+                        tblock_types=tblock_types)
                     for x in self.selected_sheetlist.get_sheets(
                         doc=self.selected_doc
                         )
@@ -2426,12 +2880,14 @@ class PrintSheetsWindow(forms.WPFWindow):
                 self._scheduled_sheets = [
                     ViewSheetListItem(
                         view_sheet=x,
-                        view_tblock=self._find_sheet_tblock(x, tblocks),
+                        view_tblock=sheet_tblocks.get(
+                            get_elementid_value(x.Id)),
                         print_settings=TitleBlockPrintSettings(
                             psettings=[print_settings],
                             set_by_param=False
                         ),
-                        rev_settings=rev_cfg)
+                        rev_settings=rev_cfg,
+                        tblock_types=tblock_types)
                     for x in self.selected_sheetlist.get_sheets(
                         doc=self.selected_doc
                         )
@@ -2443,6 +2899,7 @@ class PrintSheetsWindow(forms.WPFWindow):
     def printers_changed(self, sender, args):
         print_mgr = self._get_printmanager()
         print_mgr.SelectNewPrintDriver(self.selected_printer)
+        self._compatible_sizes.clear()
         self._setup_print_settings()
 
     def options_changed(self, sender, args):
@@ -2453,9 +2910,9 @@ class PrintSheetsWindow(forms.WPFWindow):
         self._update_combine_option()
 
         # reverse sheet if reverse is set
-        sheet_list = [x for x in self._scheduled_sheets]
+        sheet_list = self._scheduled_sheets
         if self.reverse_print:
-            sheet_list.reverse()
+            sheet_list = sheet_list[::-1]
 
         if self.combine_cb.IsChecked:
             self.hide_element(self.order_sp)
@@ -2482,16 +2939,18 @@ class PrintSheetsWindow(forms.WPFWindow):
         # decide whether to show the placeholders or not
         if not self.show_placeholders:
             self.indexspace_cb.IsEnabled = True
-            # update print indices with placeholder sheets
-            self._update_print_indices(sheet_list)
-            # remove placeholders if requested
+            # remove placeholders, indexing with or without them
+            # in the same pass
+            start_idx = self.index_start
+            format_index = make_index_formatter(self.index_digits)
+            include_placeholders = self.include_placeholders
             printable_sheets = []
-            for sheet in sheet_list:
+            for idx, sheet in enumerate(sheet_list, start_idx):
                 if sheet.printable:
+                    if not include_placeholders:
+                        idx = start_idx + len(printable_sheets)
                     printable_sheets.append(sheet)
-            # update print indices without placeholder sheets
-            if not self.include_placeholders:
-                self._update_print_indices(printable_sheets)
+                sheet.print_index = format_index(idx)
             self.sheet_list = printable_sheets
         else:
             self.indexspace_cb.IsChecked = True
@@ -2582,11 +3041,7 @@ class PrintSheetsWindow(forms.WPFWindow):
         return False
 
     def _validate_excel_path(self, require_nonempty=False):
-        try:
-            path = self.excel_path_tb.Text
-        except Exception:
-            path = ''
-        path = self._normalize_excel_path(path)
+        path = self._normalize_excel_path(self._safe_text('excel_path_tb'))
         if not path:
             if require_nonempty:
                 forms.alert('Pick a CSV file path before scheduling.')
@@ -2597,10 +3052,7 @@ class PrintSheetsWindow(forms.WPFWindow):
             forms.alert('CSV file not found:\n{}'.format(path))
             return False
         if resolved_path != path:
-            try:
-                self.excel_path_tb.Text = resolved_path
-            except Exception:
-                pass
+            self._safe_set_text('excel_path_tb', resolved_path)
         return True
 
     def _validate_export_options(self):
@@ -2782,10 +3234,7 @@ class PrintSheetsWindow(forms.WPFWindow):
             forms.alert('Select a schedule date.')
             return None
 
-        try:
-            time_text = self.schedule_time_tb.Text or ''
-        except Exception:
-            time_text = ''
+        time_text = self._safe_text('schedule_time_tb')
         parts = time_text.strip().split(':')
         if len(parts) < 2:
             forms.alert('Enter time in HH:MM (24h) format.')
@@ -2815,11 +3264,7 @@ class PrintSheetsWindow(forms.WPFWindow):
             pass
 
     def _set_schedule_status_text(self, message):
-        try:
-            if self.schedule_status_tb:
-                self.schedule_status_tb.Text = message
-        except Exception:
-            pass
+        self._safe_set_text('schedule_status_tb', message)
 
     def _update_excel_report(self, target_sheets):
         self._write_excel_report(target_sheets,
@@ -2833,28 +3278,23 @@ class PrintSheetsWindow(forms.WPFWindow):
         seen_ids = set()
         source = target_sheets or []
 
-        for item in source:
-            revit_sheet = None
+        def add_sheet(revit_sheet):
             try:
-                if hasattr(item, 'revit_sheet') and item.revit_sheet:
-                    revit_sheet = item.revit_sheet
-                elif hasattr(item, 'SheetNumber') and hasattr(item, 'Name'):
-                    revit_sheet = item
+                sid = get_elementid_value(revit_sheet.Id)
             except Exception:
-                revit_sheet = None
-
-            if not revit_sheet:
-                continue
-
-            try:
-                sid = str(get_elementid_value(revit_sheet.Id))
-            except Exception:
-                sid = str(id(revit_sheet))
+                sid = id(revit_sheet)
+            if sid not in seen_ids:
+                seen_ids.add(sid)
+                revit_sheets.append(revit_sheet)
 
-            if sid in seen_ids:
-                continue
-            seen_ids.add(sid)
-            revit_sheets.append(revit_sheet)
+        # sheet list items and revit sheets (linked docs) can be mixed
+        for item in source:
+            revit_sheet = getattr(item, 'revit_sheet', None)
+            if not revit_sheet \
+                    and hasattr(item, 'SheetNumber') and hasattr(item, 'Name'):
+                revit_sheet = item
+            if revit_sheet:
+                add_sheet(revit_sheet)
 
         if not revit_sheets:
             try:
@@ -2863,14 +3303,7 @@ class PrintSheetsWindow(forms.WPFWindow):
             except Exception:
                 fallback = []
             for revit_sheet in fallback:
-                try:
-                    sid = str(get_elementid_value(revit_sheet.Id))
-                except Exception:
-                    sid = str(id(revit_sheet))
-                if sid in seen_ids:
-                    continue
-                seen_ids.add(sid)
-                revit_sheets.append(revit_sheet)
+                add_sheet(revit_sheet)
 
         return revit_sheets
 
@@ -2880,9 +3313,6 @@ class PrintSheetsWindow(forms.WPFWindow):
                             recompute_names=False,
                             show_alert=False,
                             dry_run_mode=False):
-        if not target_sheets:
-            return False
-
         if require_writeback_opt:
             try:
                 if hasattr(self, 'excel_writeback_cb') and self.excel_writeback_cb:
@@ -2891,12 +3321,13 @@ class PrintSheetsWindow(forms.WPFWindow):
             except Exception:
                 pass
 
-        try:
-            path = self.excel_path_tb.Text
-        except Exception:
-            path = ''
+        # nothing to name or write; skip path checks and the dry run
+        if not target_sheets:
+            if show_alert:
+                forms.alert("No sheets available to write to CSV.")
+            return False
 
-        path = self._normalize_excel_path(path or '')
+        path = self._normalize_excel_path(self._safe_text('excel_path_tb'))
         if not path and allow_create:
             path = self._save_excel_file_path(path)
             path = self._normalize_excel_path(path)
@@ -2907,8 +3338,8 @@ class PrintSheetsWindow(forms.WPFWindow):
             return False
 
         parent_dir = op.dirname(path)
-        if parent_dir and not op.exists(parent_dir):
-            os.makedirs(parent_dir)
+        if parent_dir:
+            PrintUtils.ensure_dir(parent_dir)
 
         resolved_path = self._resolve_excel_path(path)
         if resolved_path:
@@ -2916,10 +3347,7 @@ class PrintSheetsWindow(forms.WPFWindow):
         elif not allow_create:
             return False
 
-        try:
-            self.excel_path_tb.Text = path
-        except Exception:
-            pass
+        self._safe_set_text('excel_path_tb', path)
 
         if op.exists(path):
             self._load_excel_rows()
@@ -2933,15 +3361,8 @@ class PrintSheetsWindow(forms.WPFWindow):
         if recompute_names:
             # Dry run should be based on current options, not existing CSV/Excel
             # override names from previous runs.
-            backup_name_rows = self._excel_rows_by_name
-            backup_number_rows = self._excel_rows_by_number
-            try:
-                self._excel_rows_by_name = {}
-                self._excel_rows_by_number = {}
+            with self._without_excel_rows():
                 self.options_changed(None, None)
-            finally:
-                self._excel_rows_by_name = backup_name_rows
-                self._excel_rows_by_number = backup_number_rows
 
         is_csv_target = ExcelDatabase._is_csv_path(path)
         include_ext = False
@@ -2951,33 +3372,39 @@ class PrintSheetsWindow(forms.WPFWindow):
         except Exception:
             include_ext = False
 
+        # pick the file name value format once for all sheets
+        if include_ext:
+            pdf_enabled = bool(self.export_pdf_enabled)
+            dwg_enabled = bool(self.export_dwg_enabled)
+            if pdf_enabled and dwg_enabled and is_csv_target:
+                # one csv row per variant
+                make_file_name_value = \
+                    lambda base_name: (base_name + ".pdf", base_name + ".dwg")
+            elif pdf_enabled and dwg_enabled:
+                make_file_name_value = "{0}.pdf;{0}.dwg".format
+            elif dwg_enabled:
+                make_file_name_value = lambda base_name: base_name + ".dwg"
+            else:
+                make_file_name_value = lambda base_name: base_name + ".pdf"
+        else:
+            make_file_name_value = lambda base_name: base_name
+
         name_map = {}
         number_map = {}
+        splitext = op.splitext
+        normalize = normalize_match_text
         for sheet in target_sheets:
-            try:
-                if not sheet.print_filename:
-                    continue
-                sheet_name_key = normalize_match_text(sheet.name)
-                sheet_number_key = normalize_match_text(sheet.number)
-                base_name = normalize_match_text(op.splitext(sheet.print_filename)[0])
-                if include_ext:
-                    pdf_enabled = bool(self.export_pdf_enabled)
-                    dwg_enabled = bool(self.export_dwg_enabled)
-                    if pdf_enabled and dwg_enabled and is_csv_target:
-                        file_name_value = [base_name + ".pdf", base_name + ".dwg"]
-                    elif pdf_enabled and dwg_enabled:
-                        file_name_value = "{}.pdf;{}.dwg".format(base_name, base_name)
-                    elif dwg_enabled:
-                        file_name_value = base_name + ".dwg"
-                    else:
-                        file_name_value = base_name + ".pdf"
-                else:
-                    file_name_value = base_name
-                name_map[sheet_name_key] = file_name_value
-                if sheet_number_key:
-                    number_map[sheet_number_key] = file_name_value
-            except Exception:
+            # only sheet list items carry a print file name
+            print_filename = getattr(sheet, 'print_filename', None)
+            if not print_filename:
                 continue
+            file_name_value = make_file_name_value(
+                normalize(splitext(print_filename)[0]))
+            # sheet items keep their normalized keys
+            name_map[sheet.name_key] = file_name_value
+            sheet_number_key = sheet.number_key
+            if sheet_number_key:
+                number_map[sheet_number_key] = file_name_value
 
         sheets = self._collect_revit_sheets(target_sheets)
         if not sheets:
@@ -2988,10 +3415,7 @@ class PrintSheetsWindow(forms.WPFWindow):
         try:
             path = op.abspath(ExcelDatabase.generate_or_update(
                 path, sheets, name_map=name_map, number_map=number_map, force_update=True))
-            try:
-                self.excel_path_tb.Text = path
-            except Exception:
-                pass
+            self._safe_set_text('excel_path_tb', path)
             if show_alert:
                 if dry_run_mode:
                     forms.alert("CSV updated (dry run, no printing):\n{}\nRows written: {}".format(path, len(sheets)), ok=True)
@@ -3021,25 +3445,31 @@ class ScheduledJob(object):
         self.RunAt = run_at
         self.TargetSheets = list(target_sheets) if target_sheets else []
         self.IsRunning = False
-        self.RemindersShown = set()
+        # bit flags of PrintScheduler.REMINDER_MARK_BITS already shown
+        self.RemindersShown = 0
 
 
 class PrintScheduler(object):
+    # reminder marks in seconds before the start: 5 minutes, every 10
+    # seconds in the final minute and every second in the final 10
+    REMINDER_MARKS = (1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 20, 30, 40, 50, 60, 300)
+    REMINDER_MARK_BITS = \
+        dict((mark, 1 << bit) for bit, mark in enumerate(REMINDER_MARKS))
+
     def __init__(self, window):
         self._window = window
         self._job = None
         self._uiapp = revit.uidoc.Application if revit.uidoc else None
         self._handler = self.on_idling
+        self._idling_attached = False
         self._timer = None
-        if self._uiapp:
-            self._uiapp.Idling += self._handler
+        # timer and idling handler only run while a job is pending
         try:
             self._timer = Windows.Threading.DispatcherTimer()
             self._timer.Interval = TimeSpan.FromSeconds(1)
             self._timer.Tick += self.on_timer_tick
-            self._timer.Start()
         except Exception as ex:
-            logger.warning("Failed to start schedule timer fallback: %s", ex)
+            logger.warning("Failed to create schedule timer fallback: %s", ex)
 
     @property
     def has_job(self):
@@ -3051,36 +3481,61 @@ class PrintScheduler(object):
 
     def set_job(self, job):
         self._job = job
+        self._reschedule()
 
     def cancel_job(self):
         self._job = None
+        self._reschedule()
 
-    def _get_due_reminder_mark(self, job, remaining_seconds):
-        if remaining_seconds <= 0:
-            return None
+    def _set_idling(self, attach):
+        if not self._uiapp or self._idling_attached == attach:
+            return
+        try:
+            if attach:
+                self._uiapp.Idling += self._handler
+            else:
+                self._uiapp.Idling -= self._handler
+            self._idling_attached = attach
+        except Exception as ex:
+            logger.warning("Failed to update schedule idling handler: %s", ex)
 
+    def _reschedule(self):
+        job = self._job
+        pending = job is not None and not job.IsRunning
+        self._set_idling(pending)
+        if not self._timer:
+            return
+        try:
+            if not pending:
+                self._timer.Stop()
+                return
+            # wake up in time for the next reminder mark or the start;
+            # every second only within the final minute
+            remaining_seconds = (job.RunAt - DateTime.Now).TotalSeconds
+            if remaining_seconds <= 65:
+                interval = 1.0
+            elif remaining_seconds <= 310:
+                interval = 10.0
+            else:
+                interval = min(remaining_seconds - 300, 60.0)
+            self._timer.Interval = TimeSpan.FromSeconds(max(0.25, interval))
+            self._timer.Start()
+        except Exception as ex:
+            logger.warning("Failed to update schedule timer: %s", ex)
+
+    def _get_due_reminder_mark(self, job, remaining_seconds):
         remaining_int = int(remaining_seconds)
         if remaining_int <= 0:
             return None
-
-        # 10-second countdown in final 10 seconds.
-        if remaining_int <= 10:
-            return remaining_int if remaining_int not in job.RemindersShown else None
-
-        # Every 10 seconds once under 60 seconds (60, 50, 40, 30, 20).
-        if remaining_int <= 60:
-            mark = int(((remaining_int + 9) // 10) * 10)
-            if mark < 20:
-                mark = 20
-            if mark > 60:
-                mark = 60
-            return mark if mark not in job.RemindersShown else None
-
-        # One-time 5-minute reminder.
-        if remaining_int <= 300 and 300 not in job.RemindersShown:
-            return 300
-
-        return None
+        # the closest mark at or above the remaining time
+        marks = self.REMINDER_MARKS
+        idx = bisect.bisect_left(marks, remaining_int)
+        if idx == len(marks):
+            return None
+        mark = marks[idx]
+        if job.RemindersShown & self.REMINDER_MARK_BITS[mark]:
+            return None
+        return mark
 
     def _show_schedule_reminder(self, mark):
         if mark == 300:
@@ -3099,15 +3554,17 @@ class PrintScheduler(object):
             logger.warning("Schedule reminder update failed: %s", ex)
             return True
 
-    def _handle_reminders(self, job):
+    def _handle_reminders(self, job, remaining_seconds):
+        # nothing to remind of before the earliest mark
+        if remaining_seconds >= self.REMINDER_MARKS[-1] + 1:
+            return True
         try:
-            remaining_seconds = (job.RunAt - DateTime.Now).TotalSeconds
             mark = self._get_due_reminder_mark(job, remaining_seconds)
             if not mark:
                 return True
 
             self._show_schedule_reminder(mark)
-            job.RemindersShown.add(mark)
+            job.RemindersShown |= self.REMINDER_MARK_BITS[mark]
             return True
         except Exception as ex:
             logger.warning("Schedule reminder handling failed: %s", ex)
@@ -3121,22 +3578,20 @@ class PrintScheduler(object):
                 self._timer.Tick -= self.on_timer_tick
             except Exception:
                 pass
-        if self._uiapp:
-            try:
-                self._uiapp.Idling -= self._handler
-            except Exception:
-                pass
+        self._set_idling(False)
 
     def _process_schedule(self):
         try:
             if self._job is None or self._job.IsRunning:
                 return
-            if DateTime.Now < self._job.RunAt:
-                self._handle_reminders(self._job)
+            remaining_seconds = (self._job.RunAt - DateTime.Now).TotalSeconds
+            if remaining_seconds > 0:
+                self._handle_reminders(self._job, remaining_seconds)
                 return
             self._job.IsRunning = True
             job = self._job
             self._job = None
+            self._reschedule()
             self._window._set_schedule_status_text("Running scheduled print...")
             try:
                 prev_suppress = self._window._suppress_csv_popups
@@ -3158,12 +3613,17 @@ class PrintScheduler(object):
 
     def on_timer_tick(self, sender, args):
         self._process_schedule()
+        self._reschedule()
 
 
 def cleanup_sheetnumbers(doc):
-    sheets = revit.query.get_sheets(doc=doc)
+    # only write sheet numbers that actually carry the marker
+    dirty_sheets = [x for x in revit.query.get_sheets(doc=doc)
+                    if NPC in x.SheetNumber]
+    if not dirty_sheets:
+        return
     with revit.Transaction('Cleanup Sheet Numbers', doc=doc):
-        for sheet in sheets:
+        for sheet in dirty_sheets:
             sheet.SheetNumber = sheet.SheetNumber.replace(NPC, '')
 
 
@@ -0,0 +1,55 @@
+"""Batched element deletion shared by the cleanup tools."""
+from pyrevit import DB
+from System import ArgumentException, InvalidOperationException
+from System.Collections.Generic import List
+
+DELETE_CHUNK_SIZE = 500
+
+
+def try_delete(doc, elem_ids):
+    with DB.SubTransaction(doc) as st:
+        st.Start()
+        try:
+            doc.Delete(elem_ids)
+            st.Commit()
+            return True
+        except (InvalidOperationException, ArgumentException):
+            st.RollBack()
+            return False
+
+
+def flush_delete(doc, chunk_ids, single_id):
+    if try_delete(doc, chunk_ids):
+        return 0
+    failed_count = 0
+    for elem_id in chunk_ids:
+        # deleting an earlier id of this chunk may have taken it along
+        if doc.GetElement(elem_id) is None:
+            continue
+        single_id.Clear()
+        single_id.Add(elem_id)
+        if not try_delete(doc, single_id):
+            failed_count += 1
+    return failed_count
+
+
+def batched_delete(doc, elem_ids, chunk=DELETE_CHUNK_SIZE):
+    """Delete ids in chunks, retrying a failed chunk one id at a time.
+
+    Ids already removed along with an element of an earlier chunk
+    (e.g. group instances of a deleted group type) are skipped.
+    """
+    # both buffers are reused for every chunk
+    chunk_ids = List[DB.ElementId](chunk)
+    single_id = List[DB.ElementId](1)
+    failed_count = 0
+    for elem_id in elem_ids:
+        if doc.GetElement(elem_id) is None:
+            continue
+        chunk_ids.Add(elem_id)
+        if chunk_ids.Count == chunk:
+            failed_count += flush_delete(doc, chunk_ids, single_id)
+            chunk_ids.Clear()
+    if chunk_ids.Count:
+        failed_count += flush_delete(doc, chunk_ids, single_id)
+    return failed_count